@@ -1,31 +1,78 @@
-from flask import Flask, render_template, request, redirect, jsonify, send_from_directory
+from flask import Flask, Request, render_template, request, redirect, jsonify, send_from_directory, flash
 import os
 import cv2
 import csv
 import json
-from datetime import datetime, timedelta
+import base64
+import numpy as np
+from datetime import datetime
 from werkzeug.utils import secure_filename
 
-from config import UPLOAD_FOLDER, BACKUP_FOLDER, DATABASE_FILE
+from config import (
+    UPLOAD_FOLDER,
+    BACKUP_FOLDER,
+    DATABASE_FILE,
+    RECOGNITION_TIMEOUT,
+    QUALITY_CHECK_ENABLED,
+    LIVE_CAPTURE_SOURCE,
+    EDGE_THUMBNAIL_MAX_BYTES,
+    EDGE_KIOSK_KEYS,
+    EVENT_BATCH_MAX,
+    BULK_IMPORT_MAX_BYTES
+)
 from utils.db_utils import init_db, get_db, close_db
 from utils.face_utils import (
-    load_encodings,
-    encode_faces,
-    recognize_faces_from_frame,
+    get_gallery,
+    upsert_staff_encoding,
+    remove_staff_encoding,
+    parse_encodings,
+    match_encodings,
     mark_attendance
 )
 from utils.backup_utils import backup_database, list_backups, delete_backup
+from utils.import_utils import import_staff
+from utils.attendance_utils import apply_scan, apply_scan_auto_checkout, apply_group_scan, record_timeout
+from utils.recognition_pool import submit_scan, get_job, pool_stats, start_pool, shared_pool
+from utils.frame_quality import check_frame
+from utils.live_capture import start_live_capture, live_stats
+from utils.event_upload import upload_events
+from utils.db_writer import writer_stats
+from utils.summary_utils import daily_trend
+from utils.cache_utils import cached
+from utils.attendance_log import (
+    STATUSES, parse_log_filters, page_limit, query_attendance_log, attendance_log_stats,
+    attendance_log_rows, monthly_hours
+)
 
 # =====================================================
 # APP CONFIG
 # =====================================================
+# /bulk_import takes a ZIP of photos, so it gets its own upload limit;
+# every other route keeps MAX_CONTENT_LENGTH
+class AppRequest(Request):
+    @property
+    def max_content_length(self):
+        if self.endpoint == "bulk_import":
+            return BULK_IMPORT_MAX_BYTES
+        return super().max_content_length
+
+
 app = Flask(__name__)
+app.request_class = AppRequest
 app.secret_key = "visionpresence-secret"
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
 app.config["MAX_CONTENT_LENGTH"] = 5 * 1024 * 1024  # 5MB
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
 
+QUALITY_MESSAGES = {
+    "unreadable": "❌ Could not read the image.",
+    "too_dark": "🌑 Too dark. Please improve the lighting.",
+    "too_bright": "☀️ Too bright. Please avoid direct light.",
+    "blurry": "🌫 Image is blurry. Please hold still.",
+    "no_face": "🙂 No face in view."
+}
+
 # =====================================================
 # INIT
 # =====================================================
@@ -73,38 +120,29 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def get_overview_data():
-    """Get overview statistics"""
+    """Get overview statistics from the daily_summary table"""
     conn = get_db()
     
     # Total registered staff
     total_staff = conn.execute("SELECT COUNT(*) as count FROM staff").fetchone()['count']
     
-    # Today's date
-    today = datetime.now().strftime("%Y-%m-%d")
-    
-    # Present today
-    today_present = conn.execute(
-        "SELECT COUNT(DISTINCT emp_id) as count FROM attendance WHERE attendance_date = ? AND status='Present'",
-        (today,)
-    ).fetchone()['count']
+    # One row per day for the last week, today last
+    trend = daily_trend(conn, 7, total_staff)
+    today_present = trend[-1]['present']
     
     # Absent (registered but not marked today)
-    today_absent = total_staff - today_present
-    
-    # Last 7 days attendance average
-    week_start = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-    week_data = conn.execute("""
-        SELECT COUNT(DISTINCT emp_id) as presents
-        FROM attendance WHERE attendance_date >= ? AND status='Present'
-    """, (week_start,)).fetchone()
+    today_absent = max(total_staff - today_present, 0)
     
-    week_attendance = int((week_data['presents'] / (total_staff * 7) * 100)) if total_staff > 0 else 0
+    # Average daily attendance rate over the last 7 days
+    week_presents = sum(day['present'] for day in trend)
+    week_attendance = int(week_presents / (total_staff * 7) * 100) if total_staff > 0 else 0
     
     return {
         'total_staff': total_staff,
         'today_present': today_present,
         'today_absent': today_absent,
         'week_attendance': week_attendance,
+        'trend': trend,
         'recent_activity': []
     }
 
@@ -118,7 +156,8 @@ def dashboard():
 
 @app.route("/overview")
 def overview():
-    data = get_overview_data()
+    today = datetime.now().strftime("%Y-%m-%d")
+    data = cached(get_db(), ("overview", today), get_overview_data)
     return render_template("overview.html", **data)
 
 # =====================================================
@@ -160,7 +199,7 @@ def register_staff():
 
             # ---------- DB INSERT ----------
             conn = get_db()
-            conn.execute("""
+            cur = conn.execute("""
                 INSERT INTO staff (
                     name, email, phone, department,
                     gender, joining_date, dob, native, image_path
@@ -173,7 +212,8 @@ def register_staff():
             conn.commit()
 
             # ---------- UPDATE FACE MODEL ----------
-            encode_faces()
+            # Only the new employee is encoded; the rest of the gallery is untouched
+            upsert_staff_encoding(cur.lastrowid, image_path)
 
             return redirect("/staff")
 
@@ -183,6 +223,37 @@ def register_staff():
 
     return render_template("register_staff.html")
 
+# =====================================================
+# BULK IMPORT
+# =====================================================
+@app.route("/bulk_import", methods=["POST"])
+def bulk_import():
+    if request.content_length and request.content_length > BULK_IMPORT_MAX_BYTES:
+        limit_mb = BULK_IMPORT_MAX_BYTES // (1024 * 1024)
+        return jsonify({"status": "failed", "message": f"Upload too large (max {limit_mb} MB)"}), 413
+
+    csv_file = request.files.get("csv")
+    zip_file = request.files.get("photos")
+    if not csv_file or not zip_file:
+        return jsonify({"status": "failed", "message": "Both 'csv' and 'photos' files are required"}), 400
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "staff.csv")
+        zip_path = os.path.join(tmp, "photos.zip")
+        csv_file.save(csv_path)
+        zip_file.save(zip_path)
+        try:
+            # Encode on the recognition workers: forking a pool from a
+            # request thread could copy a lock another thread holds
+            pool = shared_pool()
+            report = import_staff(csv_path, zip_path, workers=pool_stats()["workers"], pool=pool)
+        except Exception as e:
+            print("BULK IMPORT ERROR:", e)
+            return jsonify({"status": "failed", "message": f"Import error: {e}"}), 500
+
+    return jsonify({"status": "success", **report})
+
 # =====================================================
 # STAFF LIST
 # =====================================================
@@ -203,74 +274,36 @@ def delete_staff(emp_id):
     conn.execute("DELETE FROM staff WHERE emp_id=?", (emp_id,))
     conn.commit()
 
-    encode_faces()
+    remove_staff_encoding(emp_id)
     return redirect("/staff")
 
 # =====================================================
 # BIOMETRIC SCAN
 # =====================================================
+def get_today_attendance(conn, today):
+    """Today's scans, newest first, for the kiosk page"""
+    return attendance_log_rows(conn, {"date_from": today, "date_to": today})
+
 @app.route("/scan")
 def scan():
     conn = get_db()
     today = datetime.now().strftime("%Y-%m-%d")
-    rows = conn.execute("""
-        SELECT a.*, s.name FROM attendance a
-        JOIN staff s ON a.emp_id = s.emp_id
-        WHERE a.attendance_date = ?
-        ORDER BY a.time_in DESC
-    """, (today,)).fetchall()
-
-    # Normalize rows to plain dicts with safe time strings and precomputed duration
-    today_attendance = []
-    for r in rows:
-        ti = r['time_in']
-        to = r['time_out']
-        # time_in/time_out may be stored as strings (HH:MM:SS) or datetime objects
-        ti_str = None
-        to_str = None
-        duration = None
-
-        if ti:
-            ti_str = ti if isinstance(ti, str) else format_time_filter(ti)
-        if to:
-            to_str = to if isinstance(to, str) else format_time_filter(to)
-
-        # compute duration if both available
-        try:
-            if ti and to:
-                # if strings, parse them using attendance_date
-                if isinstance(ti, str):
-                    ti_dt = datetime.strptime(f"{r['attendance_date']} {ti}", "%Y-%m-%d %H:%M:%S")
-                else:
-                    ti_dt = ti
-
-                if isinstance(to, str):
-                    to_dt = datetime.strptime(f"{r['attendance_date']} {to}", "%Y-%m-%d %H:%M:%S")
-                else:
-                    to_dt = to
-
-                duration = round((to_dt - ti_dt).total_seconds() / 3600, 2)
-        except Exception:
-            duration = None
-
-        # Determine status
-        status = r['status'] if r['status'] else 'Present'
-        if r['is_half_day']:
-            status = 'Half Day'
-
-        today_attendance.append({
-            'name': r['name'],
-            'time_in': ti_str,
-            'time_out': to_str,
-            'time_in_picture': r['time_in_picture'],
-            'time_out_picture': r['time_out_picture'],
-            'duration': duration,
-            'status': status,
-            'is_half_day': r['is_half_day'] if r['is_half_day'] else 0
-        })
-
+    today_attendance = cached(conn, ("today_attendance", today), lambda: get_today_attendance(conn, today))
     return render_template("biometric_scan.html", today_attendance=today_attendance)
 
+# Boolean option sent as a form field or query parameter
+def _flag(name):
+    return (request.form.get(name) or request.args.get(name, "")).lower() in ("1", "true", "on")
+
+
+# Group scans always record Time Out directly; single scans do with
+# auto_checkout (per request, or AUTO_CHECKOUT for every kiosk)
+def _scan_handler(group, auto_checkout):
+    if group:
+        return apply_group_scan
+    return apply_scan_auto_checkout if auto_checkout else apply_scan
+
+
 @app.route("/mark_attendance", methods=["POST"])
 def mark_attendance_route():
     try:
@@ -282,189 +315,192 @@ def mark_attendance_route():
         if image_file.filename == "":
             return jsonify({"status": "failed", "message": "No file selected"}), 400
 
-        known = load_encodings()
+        known = get_gallery()
         
         if not known:
             return jsonify({"status": "failed", "message": "❌ No registered staff found. Please register staff first."}), 400
 
-        # Save temp image
-        temp_path = os.path.join(UPLOAD_FOLDER, "temp_scan.jpg")
-        image_file.save(temp_path)
+        # Decode in memory; the original bytes are archived once by the recorder
+        image_bytes = image_file.read()
 
-        try:
-            import face_recognition
-            frame = face_recognition.load_image_file(temp_path)
-            results = recognize_faces_from_frame(frame, known)
-        except Exception as load_err:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return jsonify({"status": "failed", "message": f"Image processing error: {str(load_err)}"}), 400
-
-        if results:
-            emp_id = results[0]["emp_id"]
-            conn = get_db()
-            
-            today = datetime.now().strftime("%Y-%m-%d")
-            now = datetime.now().strftime("%H:%M:%S")
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            # Save scanned image in appropriate folder
-            scans_folder = os.path.join(UPLOAD_FOLDER, "scans")
-            os.makedirs(scans_folder, exist_ok=True)
-            
-            # Check if already marked today
-            existing = conn.execute(
-                "SELECT * FROM attendance WHERE emp_id=? AND attendance_date=?",
-                (emp_id, today)
-            ).fetchone()
-
-            if existing:
-                if existing["time_out"]:
-                    # Already checked out
-                    return jsonify({
-                        "status": "failed",
-                        "message": f"Already checked out. See you tomorrow!"
-                    })
-                else:
-                    # Time Out scan - save picture and ask for confirmation
-                    time_out_filename = f"{emp_id}_{timestamp}_timeout.jpg"
-                    time_out_path = os.path.join(scans_folder, time_out_filename)
-                    
-                    try:
-                        with open(temp_path, 'rb') as src:
-                            with open(time_out_path, 'wb') as dst:
-                                dst.write(src.read())
-                    except:
-                        time_out_path = None
-                    
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                    
-                    return jsonify({
-                        "status": "need_timeout_confirm",
-                        "message": "Employee already checked in today. Confirm to record Time Out.",
-                        "attendance_id": existing["id"],
-                        "emp_id": emp_id,
-                        "time_out_picture": time_out_path
-                    })
-            else:
-                # Time In scan - save picture
-                time_in_filename = f"{emp_id}_{timestamp}_timein.jpg"
-                time_in_path = os.path.join(scans_folder, time_in_filename)
-                
-                try:
-                    with open(temp_path, 'rb') as src:
-                        with open(time_in_path, 'wb') as dst:
-                            dst.write(src.read())
-                except:
-                    time_in_path = None
-                
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                
-                # Get staff details for display
-                staff = conn.execute("SELECT name FROM staff WHERE emp_id=?", (emp_id,)).fetchone()
-                staff_name = staff['name'] if staff else emp_id
-                
-                conn.execute(
-                    "INSERT INTO attendance (emp_id, attendance_date, time_in, time_in_picture, status) VALUES (?, ?, ?, ?, ?)",
-                    (emp_id, today, now, time_in_path, "Present")
-                )
-                conn.commit()
+        # Cheap blur / brightness / face-presence check before the dlib pipeline
+        if QUALITY_CHECK_ENABLED:
+            ok, reason, metrics = check_frame(image_bytes)
+            if not ok:
                 return jsonify({
-                    "status": "success",
-                    "message": f"✅ Welcome! Time In recorded.",
-                    "name": staff_name,
-                    "time_in": now,
-                    "time_in_picture": time_in_path
+                    "status": "rejected",
+                    "reason": reason,
+                    "message": QUALITY_MESSAGES.get(reason, "Frame rejected"),
+                    "metrics": metrics
                 })
-        else:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return jsonify({
-                "status": "failed",
-                "message": "❌ Person not registered. Please register first."
-            })
+
+        # Recognition runs in the worker pool; "async" returns a job id at once,
+        # otherwise wait up to RECOGNITION_TIMEOUT before falling back to one
+        mode = request.form.get("mode") or request.args.get("mode", "sync")
+        # Group mode records every recognized face in the frame
+        group = _flag("group")
+        # Consecutive frames from one kiosk share face tracks. Clients that
+        # send no kiosk_id are not tracked: many kiosks can share one address
+        # behind NAT or a proxy.
+        kiosk_id = request.form.get("kiosk_id")
+        job = submit_scan(image_bytes, _scan_handler(group, _flag("auto_checkout")), kiosk_id)
+
+        if mode != "async" and job.wait(RECOGNITION_TIMEOUT):
+            return jsonify(job.response), job.http_status
+
+        return jsonify({
+            "status": "queued",
+            "message": "⏳ Scan queued for recognition.",
+            "job_id": job.id
+        }), 202
 
     except Exception as e:
         print(f"MARK ATTENDANCE ERROR: {e}")
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         return jsonify({"status": "failed", "message": f"Error: {str(e)}"}), 500
 
+
+# Edge kiosks post encodings they computed themselves, as JSON:
+# {"encodings": [[128 floats], ...], "thumbnail": "<base64 jpeg>", "group": false}
+# Matching is a single batched gallery lookup, so this runs inline.
+@app.route("/mark_attendance_encoding", methods=["POST"])
+def mark_attendance_encoding():
+    try:
+        if EDGE_KIOSK_KEYS and request.headers.get("X-Kiosk-Key") not in EDGE_KIOSK_KEYS:
+            return jsonify({"status": "failed", "message": "Unknown kiosk"}), 403
+
+        payload = request.get_json(silent=True) or {}
+        raw = payload.get("encodings", payload.get("encoding"))
+        if raw is None:
+            return jsonify({"status": "failed", "message": "No encodings provided"}), 400
+        try:
+            encodings = parse_encodings(raw)
+        except ValueError as e:
+            return jsonify({"status": "failed", "message": str(e)}), 400
+
+        thumbnail = None
+        if payload.get("thumbnail"):
+            try:
+                thumbnail = base64.b64decode(payload["thumbnail"], validate=True)
+            except ValueError:
+                return jsonify({"status": "failed", "message": "Thumbnail is not valid base64"}), 400
+            if len(thumbnail) > EDGE_THUMBNAIL_MAX_BYTES:
+                return jsonify({"status": "failed", "message": "Thumbnail too large"}), 413
+            if cv2.imdecode(np.frombuffer(thumbnail, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8) is None:
+                return jsonify({"status": "failed", "message": "Thumbnail is not a valid image"}), 400
+
+        known = get_gallery()
+        if not known:
+            return jsonify({"status": "failed", "message": "❌ No registered staff found. Please register staff first."}), 400
+
+        results = match_encodings(encodings, known)
+        handler = _scan_handler(bool(payload.get("group")), bool(payload.get("auto_checkout")))
+        return jsonify(handler(results, thumbnail))
+
+    except Exception as e:
+        print(f"MARK ATTENDANCE ENCODING ERROR: {e}")
+        return jsonify({"status": "failed", "message": f"Error: {str(e)}"}), 500
+
+
+# Offline kiosks flush their queued scans in one request:
+# {"events": [{"key", "kiosk_id", "timestamp", "encoding" | "image"}, ...]}
+# Every event gets a per-key outcome; resent keys are reported as "duplicate".
+@app.route("/upload_events", methods=["POST"])
+def upload_events_route():
+    try:
+        if EDGE_KIOSK_KEYS and request.headers.get("X-Kiosk-Key") not in EDGE_KIOSK_KEYS:
+            return jsonify({"status": "failed", "message": "Unknown kiosk"}), 403
+
+        payload = request.get_json(silent=True) or {}
+        events = payload.get("events")
+        if not isinstance(events, list) or not events:
+            return jsonify({"status": "failed", "message": "No events provided"}), 400
+        if len(events) > EVENT_BATCH_MAX:
+            return jsonify({"status": "failed", "message": f"At most {EVENT_BATCH_MAX} events per batch"}), 413
+
+        if not get_gallery():
+            return jsonify({"status": "failed", "message": "❌ No registered staff found. Please register staff first."}), 400
+
+        results, summary = upload_events(get_db(), events)
+        return jsonify({
+            "status": "success",
+            "message": f"✅ Processed {len(results)} events.",
+            "summary": summary,
+            "results": results
+        })
+
+    except Exception as e:
+        print(f"UPLOAD EVENTS ERROR: {e}")
+        return jsonify({"status": "failed", "message": f"Error: {str(e)}"}), 500
+
+
+# Poll a queued scan submitted to /mark_attendance
+@app.route("/scan_jobs/<job_id>")
+def scan_job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"status": "failed", "message": "Unknown or expired job"}), 404
+    if not job.done:
+        return jsonify(job.to_dict()), 202
+    return jsonify(job.to_dict()), job.http_status
+
+
+@app.route("/recognition_stats")
+def recognition_stats():
+    return jsonify({**pool_stats(), "writer": writer_stats()})
+
+# Per-stage counters of the server-side camera pipeline
+@app.route("/live_stats")
+def live_stats_route():
+    stats = live_stats()
+    if stats is None:
+        return jsonify({"status": "off", "message": "Live capture is not running."})
+    return jsonify(stats)
+
 # =====================================================
 # ATTENDANCE LOGS
 # =====================================================
 @app.route("/attendance")
 def attendance_logs():
     conn = get_db()
-    rows = conn.execute("""
-        SELECT a.*, s.name, s.phone, s.email FROM attendance a
-        JOIN staff s ON a.emp_id = s.emp_id
-        ORDER BY a.attendance_date DESC, a.time_in DESC
-    """).fetchall()
-
-    # Normalize logs and compute duration safely
-    logs = []
-    durations = []
-    for r in rows:
-        ti = r['time_in']
-        to = r['time_out']
-        ti_str = ti if isinstance(ti, str) else (format_time_filter(ti) if ti else None)
-        to_str = to if isinstance(to, str) else (format_time_filter(to) if to else None)
-        duration = None
-        try:
-            if ti and to:
-                if isinstance(ti, str):
-                    ti_dt = datetime.strptime(f"{r['attendance_date']} {ti}", "%Y-%m-%d %H:%M:%S")
-                else:
-                    ti_dt = ti
-                if isinstance(to, str):
-                    to_dt = datetime.strptime(f"{r['attendance_date']} {to}", "%Y-%m-%d %H:%M:%S")
-                else:
-                    to_dt = to
-                duration = round((to_dt - ti_dt).total_seconds() / 3600, 2)
-                durations.append(duration)
-        except Exception:
-            duration = None
-
-        # Determine status (Present, Absent, Half Day)
-        status = r['status'] if r['status'] else 'Present'
-        if r['is_half_day']:
-            status = 'Half Day'
-
-        logs.append({
-            'id': r['id'],
-            'emp_id': r['emp_id'],
-            'name': r['name'],
-            'phone': r['phone'],
-            'email': r['email'],
-            'attendance_date': r['attendance_date'],
-            'time_in': ti_str,
-            'time_out': to_str,
-            'time_in_picture': r['time_in_picture'],
-            'time_out_picture': r['time_out_picture'],
-            'duration': duration,
-            'status': status,
-            'is_half_day': r['is_half_day'] if r['is_half_day'] else 0
-        })
-
-    total_records = len(logs)
-    unique_employees = len(set(l['emp_id'] for l in logs))
-
-    avg_attendance = 0
-    avg_duration = 0
-    if logs:
-        present_count = sum(1 for log in logs if log['status'] in ['Present', 'Half Day'])
-        avg_attendance = int((present_count / len(logs)) * 100) if logs else 0
-        avg_duration = round(sum(durations) / len(durations), 1) if durations else 0
-
+    as_json = request.args.get("format", "").lower() == "json"
+    try:
+        filters = parse_log_filters(request.args)
+        limit = page_limit(request.args.get("limit"))
+        logs, next_cursor = query_attendance_log(conn, filters, request.args.get("cursor"), limit)
+    except ValueError as e:
+        if as_json:
+            return jsonify({"status": "failed", "message": str(e)}), 400
+        flash(str(e), "danger")
+        return redirect("/attendance")
+
+    stats = attendance_log_stats(conn, filters)
+    if as_json:
+        return jsonify({"status": "success", "logs": logs, "next_cursor": next_cursor, "stats": stats})
+
+    departments = [r[0] for r in conn.execute(
+        "SELECT DISTINCT department FROM staff WHERE department IS NOT NULL AND department <> '' ORDER BY department"
+    )]
+    # Filter args carried over to the "Next page" link
+    query = {k: v for k, v in request.args.items() if k not in ("cursor", "format") and v}
     return render_template("attendance_logs.html",
                          logs=logs,
-                         total_records=total_records,
-                         unique_employees=unique_employees,
-                         avg_attendance=avg_attendance,
-                         avg_duration=avg_duration)
+                         next_cursor=next_cursor,
+                         filters=request.args,
+                         query=query,
+                         departments=departments,
+                         statuses=STATUSES,
+                         **stats)
+
+
+# Worked hours per employee and month (?month=YYYY-MM, ?emp_id=)
+@app.route("/attendance_hours")
+def attendance_hours():
+    try:
+        emp_id = request.args.get("emp_id", type=int)
+        rows = monthly_hours(get_db(), request.args.get("month"), emp_id)
+    except ValueError as e:
+        return jsonify({"status": "failed", "message": str(e)}), 400
+    return jsonify({"status": "success", "hours": rows})
 
 
 # Endpoint to confirm/time-out an attendance record
@@ -479,22 +515,8 @@ def confirm_timeout():
         if not attendance_id:
             return jsonify({"status": "failed", "message": "Missing attendance_id"}), 400
 
-        conn = get_db()
-        now = datetime.now().strftime("%H:%M:%S")
-
-        existing = conn.execute("SELECT * FROM attendance WHERE id=?", (attendance_id,)).fetchone()
-        if not existing:
-            return jsonify({"status": "failed", "message": "Attendance record not found"}), 404
-
-        if existing["time_out"]:
-            return jsonify({"status": "failed", "message": "Time Out already recorded"}), 400
-
-        conn.execute(
-            "UPDATE attendance SET time_out=?, time_out_picture=?, is_half_day=?, status=? WHERE id=?",
-            (now, time_out_picture, is_half_day, "Present", attendance_id)
-        )
-        conn.commit()
-        return jsonify({"status": "success", "message": "✅ Time Out recorded. Have a good day!"})
+        payload, status = record_timeout(attendance_id, time_out_picture, is_half_day)
+        return jsonify(payload), status
 
     except Exception as e:
         return jsonify({"status": "failed", "message": f"Error: {str(e)}"}), 500
@@ -504,16 +526,15 @@ def confirm_timeout():
 # =====================================================
 @app.route("/export_attendance")
 def export_attendance():
+    # Same filters as /attendance, so an export matches the filtered view
+    try:
+        filters = parse_log_filters(request.args)
+    except ValueError as e:
+        return jsonify({"status": "failed", "message": str(e)}), 400
+
     try:
         conn = get_db()
-        logs = conn.execute("""
-            SELECT a.id, a.emp_id, s.name, s.phone, s.email, a.attendance_date, 
-                   a.time_in, a.time_out, a.time_in_picture, a.time_out_picture, 
-                   a.is_half_day, a.status
-            FROM attendance a
-            JOIN staff s ON a.emp_id = s.emp_id
-            ORDER BY a.attendance_date DESC, a.time_in DESC
-        """).fetchall()
+        logs = attendance_log_rows(conn, filters)
 
         format_type = request.args.get('format', 'csv').lower()
 
@@ -541,26 +562,6 @@ def export_attendance():
             # Data rows
             row_num = 2
             for log in logs:
-                duration = ""
-                if log['time_in'] and log['time_out']:
-                    try:
-                        if isinstance(log['time_in'], str):
-                            ti_dt = datetime.strptime(f"{log['attendance_date']} {log['time_in']}", "%Y-%m-%d %H:%M:%S")
-                        else:
-                            ti_dt = log['time_in']
-                        if isinstance(log['time_out'], str):
-                            to_dt = datetime.strptime(f"{log['attendance_date']} {log['time_out']}", "%Y-%m-%d %H:%M:%S")
-                        else:
-                            to_dt = log['time_out']
-                        duration = round((to_dt - ti_dt).total_seconds() / 3600, 2)
-                    except:
-                        duration = ""
-                
-                # Determine status
-                status = log['status'] if log['status'] else 'Present'
-                if log['is_half_day']:
-                    status = 'Half Day'
-                
                 ws.append([
                     log['emp_id'],
                     log['name'],
@@ -569,9 +570,9 @@ def export_attendance():
                     str(log['attendance_date']),
                     format_time_filter(log['time_in']) if log['time_in'] else '',
                     format_time_filter(log['time_out']) if log['time_out'] else '',
-                    duration,
-                    status,
-                    'Yes' if log.get('is_half_day') else 'No'
+                    log['duration'] if log['duration'] is not None else '',
+                    log['status'],
+                    'Yes' if log['is_half_day'] else 'No'
                 ])
                 row_num += 1
             
@@ -604,10 +605,6 @@ def export_attendance():
         elif format_type == 'json':
             data = []
             for log in logs:
-                status = log['status'] if log['status'] else 'Present'
-                if log['is_half_day']:
-                    status = 'Half Day'
-                    
                 data.append({
                     'emp_id': log['emp_id'],
                     'name': log['name'],
@@ -616,8 +613,9 @@ def export_attendance():
                     'date': str(log['attendance_date']),
                     'time_in': str(log['time_in']) if log['time_in'] else None,
                     'time_out': str(log['time_out']) if log['time_out'] else None,
-                    'status': status,
-                    'is_half_day': log['is_half_day'] if log['is_half_day'] else 0
+                    'duration': log['duration'],
+                    'status': log['status'],
+                    'is_half_day': log['is_half_day']
                 })
             
             response_data = jsonify(data)
@@ -631,10 +629,6 @@ def export_attendance():
             writer.writerow(['EMP ID', 'Name', 'Phone', 'Email', 'Date', 'Time In', 'Time Out', 'Status', 'Half Day'])
             
             for log in logs:
-                status = log['status'] if log['status'] else 'Present'
-                if log['is_half_day']:
-                    status = 'Half Day'
-                    
                 writer.writerow([
                     log['emp_id'],
                     log['name'],
@@ -643,7 +637,7 @@ def export_attendance():
                     log['attendance_date'],
                     format_time_filter(log['time_in']) if log['time_in'] else '',
                     format_time_filter(log['time_out']) if log['time_out'] else '',
-                    status,
+                    log['status'],
                     'Yes' if log['is_half_day'] else 'No'
                 ])
             
@@ -702,4 +696,10 @@ def delete_backup_file(filename):
 # RUN
 # =====================================================
 if __name__ == "__main__":
+    # The debug reloader imports this file twice; only the serving child forks
+    # the recognition workers (before any other thread starts) and opens the camera
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_pool()
+        if LIVE_CAPTURE_SOURCE:
+            start_live_capture()
     app.run(debug=True)
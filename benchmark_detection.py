@@ -0,0 +1,79 @@
+import os
+import argparse
+import time
+import numpy as np
+import face_recognition
+
+from config import ALLOWED_EXTENSIONS, DETECTION_UPSAMPLE
+from utils.face_utils import detect_faces
+from utils.detectors import DETECTORS, HogDetector, get_detector
+from utils.face_tracker import box_iou
+
+
+def load_images(folder, limit):
+    names = sorted(
+        n for n in os.listdir(folder)
+        if "." in n and n.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    )[:limit]
+    return [(n, face_recognition.load_image_file(os.path.join(folder, n))) for n in names]
+
+
+# 🔹 Compare detectors and scales against full-resolution HOG
+# det rate = share of images where at least one face was found
+# recall   = share of the baseline faces found again (box IoU >= 0.5)
+# enc dist = mean encoding distance to the baseline encoding of the
+#            same face (well under the 0.5 match tolerance means no accuracy loss)
+def main():
+    parser = argparse.ArgumentParser(description="Latency / accuracy of face detector backends and scales")
+    parser.add_argument("folder", help="Folder of sample kiosk frames")
+    parser.add_argument("--detectors", default="hog", help="Comma separated backends: " + ",".join(DETECTORS))
+    parser.add_argument("--scales", default="1.0,0.5,0.25", help="Comma separated detection scales")
+    parser.add_argument("--limit", type=int, default=200, help="Maximum images to use")
+    parser.add_argument("--upsample", type=int, default=DETECTION_UPSAMPLE, help="HOG upsampling passes")
+    args = parser.parse_args()
+
+    images = load_images(args.folder, args.limit)
+    if not images:
+        print("❌ No images found")
+        return
+
+    baseline = []
+    reference = HogDetector(upsample=args.upsample)
+    for _, frame in images:
+        boxes = detect_faces(frame, scale=1.0, detector=reference)
+        baseline.append((boxes, face_recognition.face_encodings(frame, boxes)))
+    total_faces = sum(len(b) for b, _ in baseline)
+    print(f"📊 {len(images)} images, {total_faces} faces found by full-resolution HOG")
+
+    print(f"{'detector':>8} {'scale':>6} {'ms/frame':>9} {'det rate':>9} {'faces':>6} {'recall':>7} {'enc dist':>9}")
+    for name in args.detectors.split(","):
+        try:
+            detector = HogDetector(upsample=args.upsample) if name == "hog" else get_detector(name)
+        except Exception as e:
+            print(f"{name:>8} ❌ {e}")
+            continue
+
+        for scale in [float(s) for s in args.scales.split(",")]:
+            elapsed, found, hit_images, matched, enc_dists = 0.0, 0, 0, 0, []
+            for (_, frame), (base_boxes, base_encs) in zip(images, baseline):
+                started = time.perf_counter()
+                boxes = detect_faces(frame, scale=scale, detector=detector)
+                elapsed += time.perf_counter() - started
+                found += len(boxes)
+                hit_images += bool(boxes)
+
+                encs = face_recognition.face_encodings(frame, boxes) if boxes else []
+                for base_box, base_enc in zip(base_boxes, base_encs):
+                    ious = [box_iou(base_box, b) for b in boxes]
+                    if ious and max(ious) >= 0.5:
+                        matched += 1
+                        enc_dists.append(np.linalg.norm(encs[int(np.argmax(ious))] - base_enc))
+
+            recall = matched / total_faces if total_faces else 0.0
+            enc_dist = float(np.mean(enc_dists)) if enc_dists else float("nan")
+            print(f"{name:>8} {scale:>6.2f} {elapsed * 1000 / len(images):>9.1f} {hit_images / len(images):>9.3f} "
+                  f"{found:>6} {recall:>7.3f} {enc_dist:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import sys
+import argparse
+import time
+import numpy as np
+
+from utils.gallery import FaceGallery, ENCODING_DIM, with_ann_index
+
+
+# 🔹 Synthetic gallery shaped roughly like dlib embeddings
+# Identities are drawn around a few hundred cluster centres (faces are not
+# uniformly spread in embedding space) so that neighbouring identities sit
+# ~0.6-1.0 apart; probes are an identity plus noise at ~0.35 distance.
+def synthetic_gallery(n, seed=0, groups=256):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (groups, ENCODING_DIM))
+    members = rng.integers(0, groups, n)
+    matrix = centres[members] + rng.normal(0, 0.055, (n, ENCODING_DIM))
+    return matrix.astype(np.float32)
+
+
+def probes_for(matrix, count, seed=1):
+    rng = np.random.default_rng(seed)
+    truth = rng.choice(len(matrix), count, replace=False)
+    noise = rng.normal(0, 0.03, (count, ENCODING_DIM)).astype(np.float32)
+    return matrix[truth] + noise, truth
+
+
+def time_matches(gallery, probes, **kwargs):
+    # Kiosk scans match one face at a time, so time single-face calls
+    results = []
+    started = time.perf_counter()
+    for probe in probes:
+        results.append(gallery.match([probe], **kwargs)[0])
+    elapsed_ms = (time.perf_counter() - started) * 1000 / len(probes)
+    return results, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare exact and IVF gallery matching")
+    parser.add_argument("--sizes", default="10000,50000,100000", help="Comma separated gallery sizes")
+    parser.add_argument("--probes", type=int, default=500, help="Queries per gallery size")
+    parser.add_argument("--nprobe", default="4,8,16,32", help="Comma separated IVF lists probed per query")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'size':>8} {'matcher':>12} {'ms/face':>9} {'recall@1':>9} {'build s':>8}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        matrix = synthetic_gallery(n)
+        probes, _ = probes_for(matrix, args.probes)
+        emp_ids = np.arange(1, n + 1)
+
+        exact = FaceGallery(emp_ids, matrix)
+        exact_results, exact_ms = time_matches(exact, probes)
+        print(f"{n:>8} {'exact':>12} {exact_ms:>9.3f} {1.0:>9.3f} {'-':>8}")
+
+        # Built the way enrollment builds it (see face_utils._commit_gallery)
+        started = time.perf_counter()
+        ivf = with_ann_index(FaceGallery(emp_ids, matrix), matcher="ivf", min_size=0)
+        build_s = time.perf_counter() - started
+
+        # The last row probes every list: an exhaustive search that must agree with exact
+        for nprobe in [int(x) for x in args.nprobe.split(",")] + [ivf.ivf.nlist]:
+            ivf_results, ivf_ms = time_matches(ivf, probes, nprobe=nprobe)
+            # Recall against the exact matcher's answer, not the synthetic truth
+            hits = sum(a["emp_id"] == b["emp_id"] for a, b in zip(ivf_results, exact_results))
+            label = f"ivf/{ivf.ivf.nlist}@{nprobe}"
+            print(f"{n:>8} {label:>12} {ivf_ms:>9.3f} {hits / len(probes):>9.3f} {build_s:>8.2f}")
+
+        if hits != len(probes):
+            print(f"[❌] IVF gallery with all {ivf.ivf.nlist} lists probed disagrees with exact search")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
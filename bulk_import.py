@@ -0,0 +1,23 @@
+import argparse
+import json
+
+from utils.import_utils import import_staff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import staff from a CSV and a ZIP of photos")
+    parser.add_argument("csv", help="CSV with columns: name, email, phone, department, gender, joining_date, dob, native, image")
+    parser.add_argument("zip", help="ZIP archive containing the photos named in the image column")
+    parser.add_argument("--workers", type=int, default=None, help="Encoding processes (default: CPU count)")
+    args = parser.parse_args()
+
+    report = import_staff(args.csv, args.zip, workers=args.workers)
+
+    print(f"✅ Imported {report['imported']} staff in {report['seconds']}s using {report['workers']} workers")
+    if report["failed"]:
+        print(f"❌ {len(report['failed'])} rows failed:")
+        print(json.dumps(report["failed"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
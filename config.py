@@ -7,21 +7,153 @@ UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "uploads")
 # Folder to store database backups
 BACKUP_FOLDER = os.path.join(os.path.dirname(__file__), "backups")
 
+# Folder holding the face gallery (encodings matrix + header)
+FACE_DATA_FOLDER = os.path.join(os.path.dirname(__file__), "face_data")
+
+# Gallery header; the versioned .npy data files live next to it
+GALLERY_FILE = os.path.join(FACE_DATA_FOLDER, "gallery.json")
+
 # ================= DATABASE =================
 # Path to the SQLite database file
 DATABASE_FILE = os.path.join(os.path.dirname(__file__), "vision_attendance.db")
 
+# Idle SQLite connections kept per process for reuse across requests
+DB_POOL_SIZE = 8
+# How long a writer waits for the lock before "database is locked"
+DB_BUSY_TIMEOUT_MS = 5000
+# Page cache per connection, and memory-mapped I/O size
+DB_CACHE_SIZE_KB = 16 * 1024
+DB_MMAP_SIZE = 256 * 1024 * 1024
+# Group commit: attendance writes arriving within this many ms (up to
+# WRITE_BATCH_MAX of them) share one transaction and one fsync
+WRITE_BATCH_WINDOW_MS = 5
+WRITE_BATCH_MAX = 32
+# Seconds a request waits for its queued write before giving up on it
+WRITE_TIMEOUT = 30
+
+# Seconds overview / today-list data may be served from cache; writes
+# invalidate it sooner through the shared cache_version counter
+CACHE_TTL = 30
+
+# Rows per /attendance page (the "limit" argument is capped at the max)
+ATTENDANCE_PAGE_SIZE = 50
+ATTENDANCE_PAGE_MAX = 500
+
 # ================= APP SETTINGS =================
 # Maximum size for uploaded files (5 MB)
 MAX_UPLOAD_SIZE = 5 * 1024 * 1024  # 5 MB
 
+# Maximum size of a /bulk_import upload (CSV + ZIP of photos, 200 MB);
+# larger batches go through bulk_import.py on the server
+BULK_IMPORT_MAX_BYTES = 200 * 1024 * 1024
+
 # Allowed image extensions
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
 
+# Write scan pictures from a background thread instead of the request thread
+SCAN_ARCHIVE_ASYNC = True
+
 # Flask secret key for sessions / flash messages
 SECRET_KEY = "visionpresence-secret"
 
+# ================= FACE RECOGNITION =================
+# Maximum face distance accepted as a match (smaller = stricter)
+FACE_RECOGNITION_TOLERANCE = 0.5
+
+# Face detector backend: "hog" (dlib, default), "haar" / "lbp" (OpenCV
+# cascades, fastest) or "dnn" (OpenCV SSD res10 on CPU). Compare them on your
+# own frames with benchmark_detection.py --detectors hog,haar,dnn
+FACE_DETECTOR = "hog"
+
+# LBP cascade and DNN model files are not bundled with opencv-python;
+# download them into face_data/models/ to use those backends
+MODELS_FOLDER = os.path.join(FACE_DATA_FOLDER, "models")
+LBP_CASCADE_FILE = os.path.join(MODELS_FOLDER, "lbpcascade_frontalface_improved.xml")
+DNN_PROTOTXT_FILE = os.path.join(MODELS_FOLDER, "deploy.prototxt")
+DNN_MODEL_FILE = os.path.join(MODELS_FOLDER, "res10_300x300_ssd_iter_140000.caffemodel")
+DNN_CONFIDENCE = 0.5
+
+# Face detection runs on a copy of the frame resized by this factor
+# (1.0 = full resolution, 0.5 = half, 0.25 = quarter); boxes are mapped back
+# and encodings are always computed on the full-resolution frame.
+# See benchmark_detection.py for per-scale latency / accuracy.
+DETECTION_SCALE = 0.5
+
+# HOG upsampling passes (each one doubles the image, finding smaller faces)
+DETECTION_UPSAMPLE = 1
+
+# Gallery matcher: "exact" scans every face, "ivf" probes an approximate
+# inverted-file index (only used once the gallery has ANN_MIN_GALLERY_SIZE faces)
+FACE_MATCHER = "exact"
+ANN_MIN_GALLERY_SIZE = 20000
+
+# IVF lists (0 = sqrt(gallery size)) and lists probed per face.
+# More probes = higher recall, slower match; see benchmark_matcher.py
+ANN_NLIST = 0
+ANN_NPROBE = 16
+
+# ================= FRAME QUALITY PRE-CHECK =================
+# Reject frames before face recognition runs (see utils/frame_quality.py).
+# Thresholds apply to a 1/4-scale grayscale copy of the frame.
+QUALITY_CHECK_ENABLED = True
+QUALITY_MIN_BRIGHTNESS = 40       # mean gray level 0-255
+QUALITY_MAX_BRIGHTNESS = 225
+QUALITY_MIN_SHARPNESS = 40        # variance of the Laplacian
+# Haar cascade "is anyone there" probe. Off by default: it can miss faces the
+# main detector finds (profile, glasses, low light), so opt in per deployment.
+QUALITY_FACE_PROBE = False
+
+# ================= FACE TRACKING =================
+# Reuse a kiosk's recent identities for faces that stay in place between
+# frames instead of re-encoding them (see utils/face_tracker.py)
+TRACKING_ENABLED = True
+TRACK_TTL = 8                 # seconds a track survives without being seen
+TRACK_MAX_AGE = 30            # seconds before a lingering face is re-encoded anyway
+TRACK_MIN_IOU = 0.4           # box overlap needed to continue a track
+TRACK_MIN_SIMILARITY = 0.85   # thumbnail correlation needed to continue a track
+TRACK_MAX_KIOSKS = 256        # per-kiosk trackers kept in memory (least recently used dropped)
+
+# ================= RECOGNITION WORKERS =================
+# Processes running detection / encoding / matching (0 = one per CPU core)
+RECOGNITION_WORKERS = 0
+
+# Seconds /mark_attendance waits for a result before handing back a job id
+RECOGNITION_TIMEOUT = 10
+
+# Seconds a finished job stays pollable at /scan_jobs/<job_id>
+RECOGNITION_JOB_TTL = 300
+
+# ================= CHECK-OUT =================
+# Record Time Out directly on a later scan instead of returning
+# need_timeout_confirm (kiosks can also opt in per request with auto_checkout=1)
+AUTO_CHECKOUT = False
+# A scan this soon after Time In is not taken as a check-out (auto / group modes)
+AUTO_CHECKOUT_MIN_SECONDS = 60
+
+# ================= EDGE KIOSKS =================
+# Kiosks that compute face encodings locally post them to
+# /mark_attendance_encoding instead of uploading frames.
+# Optional face-crop thumbnail kept for audit (bytes, after base64 decoding)
+EDGE_THUMBNAIL_MAX_BYTES = 64 * 1024
+# Shared keys accepted in the X-Kiosk-Key header; empty = no key required.
+# Encodings cannot be checked for liveness, so set keys in production.
+EDGE_KIOSK_KEYS = []
+
+# Most events accepted in one /upload_events batch
+EVENT_BATCH_MAX = 500
+# A queued scan this soon after the same person's Time In is a repeat of it
+EVENT_REPEAT_SECONDS = 60
+
+# ================= LIVE CAPTURE =================
+# Server-side camera ingestion for turnstile cameras with no browser attached
+# (see utils/live_capture.py and live_capture.py). Source is a device index
+# ("0"), a stream URL (rtsp://..., http://...) or a video file; empty = off.
+LIVE_CAPTURE_SOURCE = ""
+LIVE_CAMERA_ID = "live-0"
+# Capacity of each inter-stage queue; when full the oldest frame is dropped
+LIVE_QUEUE_SIZE = 2
+# Seconds before the same person is recorded again by the same camera
+LIVE_COOLDOWN = 300
+
 # ================= OTHER CONFIGS =================
 # Add any other global settings here
-# Example:
-# FACE_RECOGNITION_TOLERANCE = 0.6
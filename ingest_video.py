@@ -0,0 +1,41 @@
+import argparse
+import json
+from datetime import datetime
+
+from utils.video_ingest import ingest_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruct attendance from a recorded gate video")
+    parser.add_argument("video", help="Local video file")
+    parser.add_argument("--start", required=True, help="Wall-clock time of the first frame, e.g. '2024-05-02 07:30:00'")
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="Frames analysed per second of video")
+    parser.add_argument("--chunk-seconds", type=float, default=60, help="Seconds of video per parallel chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--min-gap", type=int, default=60, help="Seconds between first and last sighting needed for a Time Out")
+    parser.add_argument("--dry-run", action="store_true", help="Print events without writing attendance")
+    args = parser.parse_args()
+
+    video_start = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S")
+    report = ingest_video(
+        args.video,
+        video_start,
+        sample_fps=args.sample_fps,
+        chunk_seconds=args.chunk_seconds,
+        workers=args.workers,
+        min_gap=args.min_gap,
+        save=not args.dry_run
+    )
+
+    print(json.dumps(report["events"], indent=2))
+    print(f"📊 {report['frames']} frames ({report['video_seconds']}s of video), {report['sampled']} sampled, "
+          f"{report['chunks']} chunks on {report['workers']} workers in {report['seconds']}s")
+    print(f"📊 {report['frames_per_sec']} video frames/sec, {report['sampled_per_sec']} analysed frames/sec")
+    if args.dry_run:
+        print(f"⚠️ Dry run: {len(report['events'])} events not written")
+    else:
+        print(f"✅ {report['inserted']} attendance rows inserted, {report['updated']} updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import json
+import time
+
+from config import LIVE_CAMERA_ID, LIVE_QUEUE_SIZE, LIVE_COOLDOWN
+from utils.live_capture import LivePipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the server-side capture pipeline on a camera, stream or video file")
+    parser.add_argument("source", help="Device index (0), stream URL (rtsp://...) or video file")
+    parser.add_argument("--camera-id", default=LIVE_CAMERA_ID, help="Name used for tracking and logs")
+    parser.add_argument("--queue-size", type=int, default=LIVE_QUEUE_SIZE, help="Capacity of each stage queue")
+    parser.add_argument("--cooldown", type=int, default=LIVE_COOLDOWN, help="Seconds before re-recording a person")
+    parser.add_argument("--duration", type=float, default=0, help="Stop after this many seconds (0 = until the source ends)")
+    parser.add_argument("--interval", type=float, default=5, help="Seconds between stats printouts")
+    parser.add_argument("--no-record", action="store_true", help="Recognize only, do not write attendance")
+    parser.add_argument("--no-pace", action="store_true", help="Read video files as fast as possible")
+    args = parser.parse_args()
+
+    pipeline = LivePipeline(
+        args.source,
+        camera_id=args.camera_id,
+        queue_size=args.queue_size,
+        cooldown=args.cooldown,
+        record=not args.no_record,
+        pace=False if args.no_pace else None
+    ).start()
+
+    deadline = time.time() + args.duration if args.duration else None
+    try:
+        while pipeline.running:
+            pipeline.join(args.interval)
+            if deadline and time.time() >= deadline:
+                pipeline.stop()
+                pipeline.join()
+            print(json.dumps(pipeline.stats(), indent=2))
+    except KeyboardInterrupt:
+        pipeline.stop()
+        pipeline.join()
+
+    print("📊 Final stats:")
+    print(json.dumps(pipeline.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
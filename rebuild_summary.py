@@ -0,0 +1,21 @@
+import time
+
+from utils.db_utils import connect_db, init_db
+from utils.summary_utils import rebuild_daily_summary
+
+
+# Recompute daily_summary from the attendance history (backfill or repair)
+def main():
+    init_db()
+    started = time.perf_counter()
+    conn = connect_db()
+    try:
+        with conn:
+            rows = rebuild_daily_summary(conn)
+    finally:
+        conn.close()
+    print(f"✅ Rebuilt daily_summary: {rows} rows in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
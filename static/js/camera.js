@@ -8,6 +8,16 @@ let canvas = document.getElementById("canvas");
 let statusText = document.getElementById("status");
 let stream = null;
 
+// Stable id for this browser, so the server keeps face tracks per device
+function kioskId() {
+    let id = localStorage.getItem("kioskId");
+    if (!id) {
+        id = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(16).slice(2)}`;
+        localStorage.setItem("kioskId", id);
+    }
+    return id;
+}
+
 // ================================
 // START CAMERA
 // ================================
@@ -60,7 +70,8 @@ function captureAndRecognize() {
 
     canvas.toBlob(blob => {
         const formData = new FormData();
-        formData.append("frame", blob, "frame.jpg");
+        formData.append("image", blob, "frame.jpg");
+        formData.append("kiosk_id", kioskId());
 
         updateStatus("🧠 Scanning face...", "success");
 
@@ -72,9 +83,12 @@ function captureAndRecognize() {
         .then(data => {
             if (data.status === "success") {
                 updateStatus(
-                    `✅ Attendance marked for ${data.emp}`,
+                    `✅ Attendance marked for ${data.name}`,
                     "success"
                 );
+            } else if (data.status === "rejected") {
+                // Frame failed the server's quality pre-check (empty, dark, blurry)
+                updateStatus(data.message, "fail");
             } else {
                 updateStatus("❌ Face not recognized", "fail");
             }
@@ -0,0 +1,102 @@
+import numpy as np
+
+# Rows assigned per block when computing distances to centroids
+ASSIGN_BLOCK = 8192
+
+
+# 🔹 Nearest centroid for every row, computed in blocks to bound memory
+def assign_to_centroids(matrix, centroids):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), ASSIGN_BLOCK):
+        block = matrix[start:start + ASSIGN_BLOCK]
+        # |x - c|^2 minus the per-row constant |x|^2, which doesn't change the argmin
+        scores = c_sq[None, :] - 2 * (block @ centroids.T)
+        out[start:start + len(block)] = np.argmin(scores, axis=1)
+    return out
+
+
+# 🔹 Plain k-means (Lloyd) on a sample of the gallery
+def train_centroids(matrix, nlist, iters=10, sample_per_list=64, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    n = len(matrix)
+    sample_size = min(n, nlist * sample_per_list)
+    sample = matrix[np.sort(rng.choice(n, sample_size, replace=False))]
+
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign_to_centroids(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty lists from random sample points
+        empty = np.flatnonzero(~filled)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample_size, empty.size, replace=False)]
+    return centroids
+
+
+def default_nlist(n):
+    return max(1, int(np.sqrt(n)))
+
+
+# 🔹 Inverted-file index: gallery rows bucketed by their nearest centroid
+# Matching probes the `nprobe` closest buckets and computes exact distances
+# only for the rows inside them. FaceGallery keeps its rows sorted by bucket
+# (see `is_sorted` / `order`), so every bucket is a contiguous row range and
+# is scanned without gathering rows.
+class IVFIndex:
+    def __init__(self, centroids, assignments, trained_size):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.trained_size = int(trained_size)
+        self._c_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+        nlist = len(self.centroids)
+        self.offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.assignments, minlength=nlist), out=self.offsets[1:])
+
+    @property
+    def is_sorted(self):
+        return bool(np.all(self.assignments[:-1] <= self.assignments[1:]))
+
+    # Row permutation that groups rows by bucket
+    def order(self):
+        return np.argsort(self.assignments, kind="stable")
+
+    def permuted(self, order):
+        return IVFIndex(self.centroids, self.assignments[order], self.trained_size)
+
+    @classmethod
+    def build(cls, matrix, nlist=0, iters=10, seed=0):
+        nlist = nlist or default_nlist(len(matrix))
+        nlist = min(nlist, len(matrix))
+        centroids = train_centroids(matrix, nlist, iters=iters, seed=seed)
+        return cls(centroids, assign_to_centroids(matrix, centroids), len(matrix))
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    # 🔹 Copy-on-write updates mirroring FaceGallery.upsert/remove
+    def with_rows(self, keep_mask, new_rows):
+        new_assign = assign_to_centroids(new_rows, self.centroids) if len(new_rows) else np.empty(0, np.int32)
+        kept = self.assignments if keep_mask is None else self.assignments[keep_mask]
+        return IVFIndex(self.centroids, np.concatenate([kept, new_assign]), self.trained_size)
+
+    def with_replaced_row(self, row, encoding):
+        assignments = self.assignments.copy()
+        assignments[row] = assign_to_centroids(np.asarray(encoding).reshape(1, -1), self.centroids)[0]
+        return IVFIndex(self.centroids, assignments, self.trained_size)
+
+    # 🔹 (start, end) row ranges of the `nprobe` buckets closest to one face
+    # Only meaningful when the gallery rows are sorted by bucket.
+    def probe(self, face, nprobe):
+        nprobe = min(nprobe, self.nlist)
+        scores = self._c_sq - 2 * (self.centroids @ face)
+        lists = np.argpartition(scores, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        return [(self.offsets[l], self.offsets[l + 1]) for l in lists if self.offsets[l] < self.offsets[l + 1]]
@@ -0,0 +1,190 @@
+import base64
+from datetime import datetime
+
+from config import ATTENDANCE_PAGE_SIZE, ATTENDANCE_PAGE_MAX
+
+# =====================================================
+# ATTENDANCE LOG
+# =====================================================
+# Every read of attendance JOIN staff (/attendance, /scan, exports) goes
+# through attendance_log_rows, so statuses and durations are normalized in one
+# place. Rows are ordered newest first on (attendance_date, time_in, id),
+# which the idx_attendance_log index serves directly; a page cursor is the
+# last row's key, so page N costs the same as page 1. Durations come from the
+# integer duration_seconds column (see migration 8), never from parsing the
+# HH:MM:SS text in Python.
+
+STATUSES = ["Present", "Half Day", "Absent"]
+
+# Missing Time In sorts last, and must match the idx_attendance_log expression
+_TIME_KEY = "IFNULL(a.time_in, '')"
+_STATUS = "CASE WHEN a.is_half_day THEN 'Half Day' ELSE COALESCE(a.status, 'Present') END"
+_HOURS = "a.duration_seconds / 3600.0"
+
+
+def _parse_date(value, field):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"{field} must be YYYY-MM-DD")
+
+
+# 🔹 Read the log filters from request args; raises ValueError
+# date_from / date_to (inclusive), emp_id, department, status, q (name search)
+def parse_log_filters(args):
+    filters = {}
+    for field in ("date_from", "date_to"):
+        if args.get(field):
+            filters[field] = _parse_date(args[field], field)
+    if args.get("emp_id"):
+        try:
+            filters["emp_id"] = int(args["emp_id"])
+        except ValueError:
+            raise ValueError("emp_id must be a number")
+    if args.get("department"):
+        filters["department"] = args["department"]
+    if args.get("status"):
+        if args["status"] not in STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(STATUSES)}")
+        filters["status"] = args["status"]
+    if args.get("q"):
+        filters["q"] = args["q"].strip()
+    return filters
+
+
+def _where(filters):
+    clauses, params = [], {}
+    if "date_from" in filters:
+        clauses.append("a.attendance_date >= :date_from")
+    if "date_to" in filters:
+        clauses.append("a.attendance_date <= :date_to")
+    if "emp_id" in filters:
+        clauses.append("a.emp_id = :emp_id")
+    if "department" in filters:
+        clauses.append("s.department = :department")
+    if "status" in filters:
+        clauses.append(f"{_STATUS} = :status")
+    if filters.get("q"):
+        clauses.append("s.name LIKE :q ESCAPE '\\'")
+        params["q"] = "%" + filters["q"].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    params.update({k: v for k, v in filters.items() if k != "q"})
+    return clauses, params
+
+
+# 🔹 Opaque page cursor <-> (attendance_date, time_in, id) of the last row
+def encode_cursor(row):
+    raw = f"{row['attendance_date']}|{row['time_in'] or ''}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, time_in, row_id = raw.split("|")
+        return {"after_date": _parse_date(day, "cursor"), "after_time": time_in, "after_id": int(row_id)}
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def page_limit(value):
+    try:
+        limit = int(value) if value else ATTENDANCE_PAGE_SIZE
+    except ValueError:
+        raise ValueError("limit must be a number")
+    return max(1, min(limit, ATTENDANCE_PAGE_MAX))
+
+
+# 🔹 Normalized log rows matching the filters, newest first, as plain dicts
+# `limit` None returns every row; `cursor` continues after a previous page.
+def attendance_log_rows(conn, filters, cursor=None, limit=None):
+    clauses, params = _where(filters)
+    if cursor:
+        params.update(decode_cursor(cursor))
+        clauses.append(f"(a.attendance_date, {_TIME_KEY}, a.id) < (:after_date, :after_time, :after_id)")
+    params["limit"] = -1 if limit is None else limit
+
+    rows = conn.execute(f"""
+        SELECT a.id, a.emp_id, s.name, s.phone, s.email, s.department,
+               a.attendance_date, a.time_in, a.time_out,
+               a.time_in_picture, a.time_out_picture,
+               COALESCE(a.is_half_day, 0) AS is_half_day,
+               {_STATUS} AS status,
+               a.duration_seconds,
+               ROUND({_HOURS}, 2) AS duration
+        FROM attendance a
+        JOIN staff s ON a.emp_id = s.emp_id
+        {"WHERE " + " AND ".join(clauses) if clauses else ""}
+        ORDER BY a.attendance_date DESC, {_TIME_KEY} DESC, a.id DESC
+        LIMIT :limit
+    """, params)
+    return [dict(r) for r in rows]
+
+
+# 🔹 One page of the log; returns (logs, next_cursor or None)
+def query_attendance_log(conn, filters, cursor=None, limit=ATTENDANCE_PAGE_SIZE):
+    logs = attendance_log_rows(conn, filters, cursor, limit + 1)
+    next_cursor = encode_cursor(logs[limit - 1]) if len(logs) > limit else None
+    return logs[:limit], next_cursor
+
+
+# 🔹 Summary stats over every row matching the filters (not just one page)
+def attendance_log_stats(conn, filters):
+    clauses, params = _where(filters)
+    row = conn.execute(f"""
+        SELECT COUNT(*) AS total_records,
+               COUNT(DISTINCT a.emp_id) AS unique_employees,
+               SUM({_STATUS} IN ('Present', 'Half Day')) AS present,
+               AVG({_HOURS}) AS avg_duration,
+               MIN(a.attendance_date) AS first_date,
+               MAX(a.attendance_date) AS last_date
+        FROM attendance a
+        JOIN staff s ON a.emp_id = s.emp_id
+        {"WHERE " + " AND ".join(clauses) if clauses else ""}
+    """, params).fetchone()
+
+    total = row["total_records"]
+    return {
+        "total_records": total,
+        "unique_employees": row["unique_employees"],
+        "avg_attendance": int(row["present"] * 100 / total) if total else 0,
+        "avg_duration": round(row["avg_duration"], 1) if row["avg_duration"] is not None else 0,
+        "first_date": row["first_date"],
+        "last_date": row["last_date"]
+    }
+
+
+# 🔹 Worked hours per employee and month (a month range reads idx_attendance_hours)
+# `month` is "YYYY-MM" (all history when omitted); open rows count as days
+# but add no hours.
+def monthly_hours(conn, month=None, emp_id=None):
+    clauses, params, source = [], {}, "attendance a"
+    if month:
+        try:
+            start = datetime.strptime(month, "%Y-%m")
+        except ValueError:
+            raise ValueError("month must be YYYY-MM")
+        clauses.append("a.attendance_date BETWEEN :start AND :end")
+        params["start"] = start.strftime("%Y-%m-01")
+        params["end"] = start.strftime("%Y-%m-31")
+        # The planner does not credit an index for holding a virtual column,
+        # so without the hint a month range would recompute every duration.
+        # Other queries are left to the planner (emp_id alone uses the
+        # (emp_id, attendance_date) index).
+        source = "attendance a INDEXED BY idx_attendance_hours"
+    if emp_id is not None:
+        clauses.append("a.emp_id = :emp_id")
+        params["emp_id"] = emp_id
+
+    rows = conn.execute(f"""
+        SELECT h.emp_id, s.name, h.month, h.days, ROUND(h.seconds / 3600.0, 2) AS hours
+        FROM (
+            SELECT a.emp_id, substr(a.attendance_date, 1, 7) AS month,
+                   COUNT(*) AS days, COALESCE(SUM(a.duration_seconds), 0) AS seconds
+            FROM {source}
+            {"WHERE " + " AND ".join(clauses) if clauses else ""}
+            GROUP BY a.emp_id, month
+        ) h
+        JOIN staff s ON s.emp_id = h.emp_id
+        ORDER BY h.month DESC, h.emp_id
+    """, params)
+    return [dict(r) for r in rows]
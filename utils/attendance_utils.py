@@ -0,0 +1,228 @@
+from datetime import datetime
+
+from config import AUTO_CHECKOUT, AUTO_CHECKOUT_MIN_SECONDS
+from utils.scan_archive import archive_scan, scan_path
+from utils.db_writer import run_write
+
+
+# 🔹 Archive a scan picture, never failing the scan over it
+def _archive_or_none(image_bytes, filename):
+    if not image_bytes:
+        return None
+    try:
+        return archive_scan(image_bytes, filename)
+    except Exception:
+        return None
+
+
+# =====================================================
+# ATTENDANCE STATE TRANSITIONS
+# =====================================================
+# Each transition is one statement against the unique
+# (emp_id, attendance_date) index, so concurrent scans cannot race between a
+# lookup and the write. RETURNING hands back the row (and the staff name), so
+# no follow-up SELECT is needed on the success paths.
+
+# Time In if the employee has no row today, otherwise nothing
+CHECK_IN_SQL = """
+    INSERT INTO attendance (emp_id, attendance_date, time_in, time_in_picture, status)
+    VALUES (:emp_id, :day, :time, :picture, 'Present')
+    ON CONFLICT(emp_id, attendance_date) DO NOTHING
+    RETURNING id, (SELECT name FROM staff WHERE emp_id = attendance.emp_id) AS name
+"""
+
+# Time In if there is no row today, Time Out if the open row is at least
+# :min_gap seconds old; no row is returned when neither applies
+CHECK_IN_OR_OUT_SQL = """
+    INSERT INTO attendance (emp_id, attendance_date, time_in, time_in_picture, status)
+    VALUES (:emp_id, :day, :time, :picture, 'Present')
+    ON CONFLICT(emp_id, attendance_date) DO UPDATE SET
+        time_out = excluded.time_in,
+        time_out_picture = excluded.time_in_picture
+    WHERE attendance.time_out IS NULL
+      AND strftime('%s', excluded.time_in) - strftime('%s', attendance.time_in) >= :min_gap
+    RETURNING id, time_in, time_out, (SELECT name FROM staff WHERE emp_id = attendance.emp_id) AS name
+"""
+
+
+def _scan_params(emp_id, now, picture):
+    return {
+        "emp_id": emp_id,
+        "day": now.strftime("%Y-%m-%d"),
+        "time": now.strftime("%H:%M:%S"),
+        "picture": picture,
+        "min_gap": AUTO_CHECKOUT_MIN_SECONDS
+    }
+
+
+# Why CHECK_IN_OR_OUT_SQL returned nothing: already out, or Time In too recent
+def _no_transition(conn, emp_id, day):
+    row = conn.execute(
+        "SELECT time_in, time_out FROM attendance WHERE emp_id=? AND attendance_date=?",
+        (emp_id, day)
+    ).fetchone()
+    return "already_checked_out" if row is None or row["time_out"] else "already_checked_in"
+
+
+# 🔹 Apply one recognized scan to today's attendance
+# First scan of the day records Time In. A later scan asks the kiosk to
+# confirm Time Out (see /confirm_timeout), or records it straight away with
+# `auto_checkout`. Returns the JSON payload sent back to the kiosk.
+def record_scan(emp_id, image_bytes=None, now=None, auto_checkout=AUTO_CHECKOUT):
+    return run_write(_record_scan, emp_id, image_bytes, now, auto_checkout)
+
+
+# Write op for the group-commit writer (see utils/db_writer.py)
+def _record_scan(conn, emp_id, image_bytes=None, now=None, auto_checkout=False):
+    now = now or datetime.now()
+    time_now = now.strftime("%H:%M:%S")
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
+
+    if auto_checkout:
+        name = f"{emp_id}_{timestamp}_scan.jpg"
+        params = _scan_params(emp_id, now, scan_path(name) if image_bytes else None)
+        row = conn.execute(CHECK_IN_OR_OUT_SQL, params).fetchone()
+        if row is None:
+            if _no_transition(conn, emp_id, params["day"]) == "already_checked_out":
+                return {"status": "failed", "message": "Already checked out. See you tomorrow!"}
+            return {"status": "failed", "message": "Already checked in. Scan again later to check out."}
+
+        picture = _archive_or_none(image_bytes, name)
+        if row["time_out"]:
+            return {
+                "status": "success",
+                "message": "✅ Time Out recorded. Have a good day!",
+                "name": row["name"] or emp_id,
+                "time_out": time_now,
+                "time_out_picture": picture
+            }
+        return {
+            "status": "success",
+            "message": "✅ Welcome! Time In recorded.",
+            "name": row["name"] or emp_id,
+            "time_in": time_now,
+            "time_in_picture": picture
+        }
+
+    name = f"{emp_id}_{timestamp}_timein.jpg"
+    params = _scan_params(emp_id, now, scan_path(name) if image_bytes else None)
+    row = conn.execute(CHECK_IN_SQL, params).fetchone()
+    if row is not None:
+        # Time In scan - save picture
+        return {
+            "status": "success",
+            "message": "✅ Welcome! Time In recorded.",
+            "name": row["name"] or emp_id,
+            "time_in": time_now,
+            "time_in_picture": _archive_or_none(image_bytes, name)
+        }
+
+    existing = conn.execute(
+        "SELECT id, time_out FROM attendance WHERE emp_id=? AND attendance_date=?",
+        (emp_id, params["day"])
+    ).fetchone()
+    if existing["time_out"]:
+        # Already checked out
+        return {
+            "status": "failed",
+            "message": "Already checked out. See you tomorrow!"
+        }
+
+    # Time Out scan - save picture and ask for confirmation
+    time_out_path = _archive_or_none(image_bytes, f"{emp_id}_{timestamp}_timeout.jpg")
+    return {
+        "status": "need_timeout_confirm",
+        "message": "Employee already checked in today. Confirm to record Time Out.",
+        "attendance_id": existing["id"],
+        "emp_id": emp_id,
+        "time_out_picture": time_out_path
+    }
+
+
+# 🔹 Turn recognition results for one frame into the kiosk response
+def apply_scan(results, image_bytes=None, auto_checkout=AUTO_CHECKOUT):
+    if not results:
+        return {
+            "status": "failed",
+            "message": "❌ Person not registered. Please register first."
+        }
+    return record_scan(results[0]["emp_id"], image_bytes, auto_checkout=auto_checkout)
+
+
+# 🔹 Same as apply_scan, always recording Time Out without confirmation
+def apply_scan_auto_checkout(results, image_bytes=None):
+    return apply_scan(results, image_bytes, auto_checkout=True)
+
+
+# 🔹 Group check-in: record every recognized face in the frame
+# Each person gets Time In on their first scan of the day and Time Out on a
+# later one at least AUTO_CHECKOUT_MIN_SECONDS after it (no confirmation
+# step). The group frame is archived once and all rows are written in a
+# single transaction.
+def apply_group_scan(results, image_bytes=None, now=None):
+    if not results:
+        return apply_scan(results)
+    return run_write(_record_group_scan, results, image_bytes, now)
+
+
+def _record_group_scan(conn, results, image_bytes=None, now=None):
+    now = now or datetime.now()
+    time_now = now.strftime("%H:%M:%S")
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
+
+    # One entry per employee, keeping the closest match
+    best = {}
+    for r in results:
+        if r["emp_id"] not in best or r["distance"] < best[r["emp_id"]]["distance"]:
+            best[r["emp_id"]] = r
+    emp_ids = list(best.keys())
+
+    name = f"group_{timestamp}_{'-'.join(map(str, emp_ids))}.jpg"
+    path = scan_path(name) if image_bytes else None
+
+    people = []
+    for emp_id in emp_ids:
+        params = _scan_params(emp_id, now, path)
+        row = conn.execute(CHECK_IN_OR_OUT_SQL, params).fetchone()
+        if row is None:
+            action = _no_transition(conn, emp_id, params["day"])
+            staff = conn.execute("SELECT name FROM staff WHERE emp_id=?", (emp_id,)).fetchone()
+            people.append({"emp_id": emp_id, "name": staff["name"] if staff else emp_id, "action": action})
+        elif row["time_out"]:
+            people.append({"emp_id": emp_id, "name": row["name"] or emp_id, "action": "time_out", "time_out": time_now})
+        else:
+            people.append({"emp_id": emp_id, "name": row["name"] or emp_id, "action": "time_in", "time_in": time_now})
+
+    recorded = sum(1 for p in people if p["action"] in ("time_in", "time_out"))
+    picture = _archive_or_none(image_bytes, name) if recorded else None
+    return {
+        "status": "success" if recorded else "failed",
+        "message": f"✅ Recorded {recorded} of {len(people)} people." if recorded else "Nobody in view needs a Time In or Time Out right now.",
+        "people": people,
+        "picture": picture
+    }
+
+
+# 🔹 Record a confirmed Time Out (see /mark_attendance "need_timeout_confirm")
+# Returns (payload, http_status).
+def record_timeout(attendance_id, time_out_picture=None, is_half_day=0, now=None):
+    return run_write(_record_timeout, attendance_id, time_out_picture, is_half_day, now)
+
+
+def _record_timeout(conn, attendance_id, time_out_picture=None, is_half_day=0, now=None):
+    now = (now or datetime.now()).strftime("%H:%M:%S")
+
+    row = conn.execute(
+        """
+        UPDATE attendance SET time_out=?, time_out_picture=?, is_half_day=?, status=?
+        WHERE id=? AND time_out IS NULL
+        RETURNING id
+        """,
+        (now, time_out_picture, is_half_day, "Present", attendance_id)
+    ).fetchone()
+    if row is not None:
+        return {"status": "success", "message": "✅ Time Out recorded. Have a good day!"}, 200
+
+    if conn.execute("SELECT 1 FROM attendance WHERE id=?", (attendance_id,)).fetchone() is None:
+        return {"status": "failed", "message": "Attendance record not found"}, 404
+    return {"status": "failed", "message": "Time Out already recorded"}, 400
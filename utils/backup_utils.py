@@ -1,9 +1,11 @@
 import os
-from shutil import copyfile
+import sqlite3
 from datetime import datetime
 
+from config import DATABASE_FILE
+
 # Folder paths
-DB_PATH = "database/attendance.db"
+DB_PATH = DATABASE_FILE
 BACKUP_FOLDER = "backups/"
 
 # 🔹 Ensure backup folder exists
@@ -18,7 +20,15 @@ def backup_database():
     backup_name = f"attendance_backup_{now}.db"
     backup_path = os.path.join(BACKUP_FOLDER, backup_name)
 
-    copyfile(DB_PATH, backup_path)
+    # Online backup API: consistent snapshot that includes pages still in the
+    # WAL file, which a plain file copy would miss
+    src = sqlite3.connect(DB_PATH)
+    dst = sqlite3.connect(backup_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
     print(f"[✅] Backup created: {backup_name}")
     return backup_name
 
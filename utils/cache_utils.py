@@ -0,0 +1,53 @@
+import time
+import threading
+
+from config import CACHE_TTL
+
+# =====================================================
+# PAGE DATA CACHE
+# =====================================================
+# Per-process cache for read-heavy page data (overview stats, today's list).
+# Every entry remembers the cache_version it was computed at; triggers bump
+# that counter on any staff / attendance write from any process, so a write
+# anywhere invalidates every worker's copy on its next read. CACHE_TTL caps
+# the age of an entry regardless (e.g. across midnight).
+
+_cache = {}
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def data_version(conn):
+    row = conn.execute("SELECT version FROM cache_version WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+# 🔹 Return compute() for `key`, reusing the cached value while the data
+# version is unchanged and the entry is younger than `ttl` seconds
+def cached(conn, key, compute, ttl=CACHE_TTL):
+    version = data_version(conn)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version and entry[1] > now:
+            _stats["hits"] += 1
+            return entry[2]
+        _stats["misses"] += 1
+
+    value = compute()
+    with _lock:
+        # Drop stale entries (e.g. yesterday's keys) while we are here
+        for k in [k for k, e in _cache.items() if e[1] <= now or e[0] != version]:
+            del _cache[k]
+        _cache[key] = (version, now + ttl, value)
+    return value
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def cache_stats():
+    with _lock:
+        return {"entries": len(_cache), **_stats}
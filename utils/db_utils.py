@@ -1,15 +1,82 @@
+import os
+import queue
 import sqlite3
+import threading
 from flask import g, current_app
-from config import DATABASE_FILE
+from config import (
+    DATABASE_FILE,
+    DB_POOL_SIZE,
+    DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE
+)
 
 DATABASE_PATH = DATABASE_FILE  # Ensure this is absolute
 
 
+# Per-connection settings; WAL itself is persistent and set by init_db().
+# synchronous=NORMAL is durable against application crashes in WAL mode and
+# only risks the last commits on power loss, in exchange for no fsync per write.
+def _configure(db):
+    db.row_factory = sqlite3.Row
+    db.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.execute(f"PRAGMA cache_size = {-int(DB_CACHE_SIZE_KB)}")
+    db.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    db.execute("PRAGMA temp_store = MEMORY")
+    return db
+
+
+# Plain connection for scripts and background work outside a request
+def connect_db():
+    db = sqlite3.connect(DATABASE_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    return _configure(db)
+
+
+# =====================================================
+# CONNECTION POOL
+# =====================================================
+# Idle connections reused across requests. SQLite handles must not cross a
+# fork, so a child process (recognition workers) starts with an empty pool.
+_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_pool_pid = os.getpid()
+_pool_lock = threading.Lock()
+
+
+def _reset_pool_after_fork():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool_pid != os.getpid():
+            _pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+            _pool_pid = os.getpid()
+
+
+def acquire_db():
+    _reset_pool_after_fork()
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        return connect_db()
+
+
+def release_db(db):
+    _reset_pool_after_fork()
+    try:
+        # Never hand out a connection with a half-finished transaction
+        if db.in_transaction:
+            db.rollback()
+        _pool.put_nowait(db)
+    except (queue.Full, sqlite3.Error):
+        try:
+            db.close()
+        except Exception:
+            pass
+
+
 def get_db():
     db = g.get("db")
     if db is None:
-        db = sqlite3.connect(DATABASE_PATH)
-        db.row_factory = sqlite3.Row
+        db = acquire_db()
         g.db = db
     return db
 
@@ -17,21 +84,35 @@ def get_db():
 def close_db(e=None):
     db = g.pop("db", None)
     if db is not None:
-        try:
-            db.close()
-        except Exception:
-            pass
+        release_db(db)
 
 
-def init_db():
-    # Always use absolute path
-    db = sqlite3.connect(DATABASE_PATH)
-    cursor = db.cursor()
+# =====================================================
+# SCHEMA MIGRATIONS
+# =====================================================
+# Applied in order; PRAGMA user_version stores the last one applied, so
+# existing data is never dropped. Add new steps at the end, never edit old ones.
 
-    # Drop old tables if they exist (to reset schema)
-    cursor.execute("DROP TABLE IF EXISTS attendance")
-    cursor.execute("DROP TABLE IF EXISTS staff")
+# 🔹 Move attendance rows matching `where` into attendance_duplicates
+# Used where a new unique index would reject existing rows: they are set
+# aside unchanged (with the reason) for review instead of being deleted.
+def _set_aside_attendance(cursor, where, reason):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_duplicates AS
+        SELECT *, '' AS moved_reason, '' AS moved_at FROM attendance WHERE 0
+    """)
+    ids = [row[0] for row in cursor.execute(f"SELECT id FROM attendance WHERE {where} ORDER BY id")]
+    if not ids:
+        return
+    cursor.execute(f"""
+        INSERT INTO attendance_duplicates
+        SELECT *, ?, CURRENT_TIMESTAMP FROM attendance WHERE {where}
+    """, (reason,))
+    cursor.execute(f"DELETE FROM attendance WHERE {where}")
+    print(f"[⚠️] Moved {len(ids)} {reason} to attendance_duplicates (ids: {', '.join(map(str, ids))})")
 
+
+def _create_base_tables(cursor):
     # Staff table with extended info
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS staff (
@@ -66,7 +147,184 @@ def init_db():
         )
     """)
 
-    db.commit()
-    db.close()
-    print(f"Database initialized at {DATABASE_PATH}")
 
+def _create_kiosk_events(cursor):
+    # Idempotency keys of events uploaded by offline kiosks (/upload_events)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS kiosk_events (
+            idempotency_key TEXT PRIMARY KEY,
+            kiosk_id TEXT,
+            client_ts TEXT,
+            emp_id INTEGER,
+            outcome TEXT,
+            received_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _index_attendance(cursor):
+    # Duplicate open rows (from concurrent scans) would block the unique
+    # index; keep the earliest one per employee and day
+    _set_aside_attendance(cursor, """
+        time_out IS NULL
+        AND id NOT IN (
+            SELECT MIN(id) FROM attendance
+            WHERE time_out IS NULL
+            GROUP BY emp_id, attendance_date
+        )
+    """, "duplicate open attendance rows")
+
+    # Per-scan "already marked today?" lookup
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_emp_date ON attendance(emp_id, attendance_date)")
+    # Date-filtered overview / log queries
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_attendance_date ON attendance(attendance_date)")
+    # At most one open (not yet timed-out) record per employee per day
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_open
+        ON attendance(emp_id, attendance_date) WHERE time_out IS NULL
+    """)
+
+
+def _unique_attendance_day(cursor):
+    # Keep the earliest row of each employee-day as it is; any later ones
+    # go to attendance_duplicates for an admin to reconcile by hand
+    _set_aside_attendance(cursor, """
+        id NOT IN (SELECT MIN(id) FROM attendance GROUP BY emp_id, attendance_date)
+    """, "duplicate attendance rows per employee-day")
+
+    # One row per employee per day: the conflict target for the check-in /
+    # check-out upserts. It replaces both earlier (emp_id, attendance_date) indexes.
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_emp_date ON attendance(emp_id, attendance_date)")
+    cursor.execute("DROP INDEX IF EXISTS idx_attendance_emp_date")
+    cursor.execute("DROP INDEX IF EXISTS uq_attendance_open")
+
+
+def _create_daily_summary(cursor):
+    from utils.summary_utils import SUMMARY_TRIGGERS, rebuild_daily_summary
+
+    # Per day and department counts kept in step with attendance / staff by
+    # triggers, so the overview reads a few rows instead of the history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            summary_date TEXT NOT NULL,
+            department TEXT NOT NULL DEFAULT '',
+            present INTEGER NOT NULL DEFAULT 0,
+            half_day INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (summary_date, department)
+        ) WITHOUT ROWID
+    """)
+    for trigger in SUMMARY_TRIGGERS:
+        cursor.execute(trigger)
+    rebuild_daily_summary(cursor)
+
+
+def _create_cache_version(cursor):
+    # Shared "data changed" counter for the page caches in every process
+    # (see utils/cache_utils.py); bumped by triggers on any staff/attendance write
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cache_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO cache_version (id, version) VALUES (1, 0)")
+    for table in ("attendance", "staff"):
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_cache_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE cache_version SET version = version + 1 WHERE id = 1;
+                END
+            """)
+
+
+def _index_attendance_log(cursor):
+    # Newest-first keyset pages of /attendance (see utils/attendance_log.py);
+    # the expression must match its ORDER BY. Covers the old date-only index.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_log
+        ON attendance(attendance_date, IFNULL(time_in, ''), id)
+    """)
+    cursor.execute("DROP INDEX IF EXISTS idx_attendance_date")
+
+
+def _add_attendance_seconds(cursor):
+    # Integer views of the HH:MM:SS text columns: seconds since midnight and
+    # the worked duration. Virtual generated columns (the only kind ALTER TABLE
+    # can add) keep every writer unchanged; the index stores the computed
+    # duration so per-month hour totals are a range scan of the index alone.
+    columns = {row[1] for row in cursor.execute("PRAGMA table_xinfo(attendance)")}
+    for column, expr in (
+        ("time_in_sec", "CAST(strftime('%s', time_in) AS INTEGER) % 86400"),
+        ("time_out_sec", "CAST(strftime('%s', time_out) AS INTEGER) % 86400"),
+        ("duration_seconds", "time_out_sec - time_in_sec"),
+    ):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE attendance ADD COLUMN {column} INTEGER GENERATED ALWAYS AS ({expr}) VIRTUAL")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_attendance_hours
+        ON attendance(attendance_date, emp_id, duration_seconds)
+    """)
+
+
+MIGRATIONS = [
+    (1, "base staff / attendance tables", _create_base_tables),
+    (2, "kiosk_events idempotency table", _create_kiosk_events),
+    (3, "attendance indexes", _index_attendance),
+    (4, "one attendance row per employee per day", _unique_attendance_day),
+    (5, "daily_summary table", _create_daily_summary),
+    (6, "cache_version counter", _create_cache_version),
+    (7, "attendance log index", _index_attendance_log),
+    (8, "integer time / duration columns", _add_attendance_seconds),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# 🔹 Bring the database up to SCHEMA_VERSION
+# Each step runs in its own transaction together with the user_version bump;
+# BEGIN IMMEDIATE makes concurrent starters wait instead of racing.
+def migrate(db):
+    db.isolation_level = None
+    try:
+        for version, description, step in MIGRATIONS:
+            cursor = db.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                current = cursor.execute("PRAGMA user_version").fetchone()[0]
+                if version <= current:
+                    cursor.execute("COMMIT")
+                    continue
+                step(cursor)
+                cursor.execute(f"PRAGMA user_version = {int(version)}")
+                cursor.execute("COMMIT")
+                print(f"[✅] Migration {version}: {description}")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+    finally:
+        db.isolation_level = ""
+
+
+# RETURNING (attendance upserts) needs 3.35; generated columns (migration 8) need 3.31
+SQLITE_MIN_VERSION = (3, 35, 0)
+
+
+def init_db():
+    if sqlite3.sqlite_version_info < SQLITE_MIN_VERSION:
+        raise RuntimeError(
+            f"SQLite {sqlite3.sqlite_version} is too old: VisionPresence needs "
+            f"{'.'.join(map(str, SQLITE_MIN_VERSION))} or newer (RETURNING, generated columns). "
+            "Use a Python build linked against a newer SQLite."
+        )
+    # Always use absolute path
+    db = sqlite3.connect(DATABASE_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    try:
+        # Readers no longer block writers (and vice versa); persists in the file
+        db.execute("PRAGMA journal_mode = WAL")
+        migrate(db)
+    finally:
+        db.close()
+    print(f"Database initialized at {DATABASE_PATH}")
@@ -0,0 +1,157 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from config import WRITE_BATCH_MAX, WRITE_BATCH_WINDOW_MS, WRITE_TIMEOUT
+from utils.db_utils import connect_db
+
+# =====================================================
+# GROUP-COMMIT WRITER
+# =====================================================
+# One thread per process owns the write connection. Callers hand it a
+# function fn(conn, *args) that reads and writes without committing; the
+# writer collects whatever arrives within WRITE_BATCH_WINDOW_MS (up to
+# WRITE_BATCH_MAX ops), runs each inside its own SAVEPOINT and commits the
+# whole batch once. A caller's future resolves only after that COMMIT, so a
+# success still means the write is on disk. A batch that fails as a whole
+# (connection, BEGIN or COMMIT) fails every future in it; the writer thread
+# itself survives and is restarted if it ever dies.
+
+_queue = queue.Queue()
+_thread = None
+_thread_pid = None
+_start_lock = threading.Lock()
+_stats = {"batches": 0, "ops": 0, "failed": 0, "largest": 0, "commit_ms": 0.0}
+
+
+def _run_batch(conn, batch):
+    outcomes = []
+    conn.execute("BEGIN IMMEDIATE")
+    for fn, args, future in batch:
+        # A failing op is undone on its own; the rest of the batch still commits
+        conn.execute("SAVEPOINT op")
+        try:
+            result = fn(conn, *args)
+            conn.execute("RELEASE op")
+            outcomes.append((future, result, None))
+        except Exception as e:
+            conn.execute("ROLLBACK TO op")
+            conn.execute("RELEASE op")
+            outcomes.append((future, None, e))
+
+    t0 = time.perf_counter()
+    try:
+        conn.execute("COMMIT")
+    except Exception as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        outcomes = [(future, None, e) for future, _, _ in outcomes]
+    commit_ms = (time.perf_counter() - t0) * 1000
+
+    _stats["batches"] += 1
+    _stats["ops"] += len(batch)
+    _stats["largest"] = max(_stats["largest"], len(batch))
+    _stats["commit_ms"] += commit_ms
+    for future, result, error in outcomes:
+        if error is not None:
+            _stats["failed"] += 1
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def _open_writer_conn():
+    conn = connect_db()
+    # Transactions are managed explicitly with BEGIN / SAVEPOINT / COMMIT
+    conn.isolation_level = None
+    return conn
+
+
+def _writer_loop():
+    conn = None
+    window = WRITE_BATCH_WINDOW_MS / 1000
+    while True:
+        batch = [_queue.get()]
+        deadline = time.perf_counter() + window
+        while len(batch) < WRITE_BATCH_MAX:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+            except queue.Empty:
+                break
+        # Callers that gave up waiting (see run_write) are skipped
+        batch = [op for op in batch if op[2].set_running_or_notify_cancel()]
+        if not batch:
+            continue
+        try:
+            if conn is None:
+                conn = _open_writer_conn()
+            _run_batch(conn, batch)
+        except Exception as e:
+            print(f"DB WRITER ERROR: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            try:
+                if conn is not None and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except Exception:
+                # Unusable connection: reconnect for the next batch
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+
+
+def _ensure_writer():
+    global _queue, _thread, _thread_pid
+    if _thread is not None and _thread_pid == os.getpid() and _thread.is_alive():
+        return
+    with _start_lock:
+        # A forked child gets a fresh queue and thread of its own; a dead
+        # thread is replaced and picks up the ops already queued
+        if _thread_pid != os.getpid():
+            _queue = queue.Queue()
+        if _thread is None or _thread_pid != os.getpid() or not _thread.is_alive():
+            _thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _thread.start()
+            _thread_pid = os.getpid()
+
+
+# 🔹 Queue fn(conn, *args) for the next group commit; returns a Future
+def submit_write(fn, *args):
+    _ensure_writer()
+    if threading.current_thread() is _thread:
+        raise RuntimeError("submit_write called from inside a write op")
+    future = Future()
+    _queue.put((fn, args, future))
+    return future
+
+
+# 🔹 Same as submit_write, but wait for the commit and return fn's result
+# Raises TimeoutError if the op has not started within `timeout` seconds; the
+# op is then cancelled and never runs. One already in a batch is waited for.
+def run_write(fn, *args, timeout=WRITE_TIMEOUT):
+    future = submit_write(fn, *args)
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        if future.cancel():
+            raise TimeoutError("Timed out waiting for the database writer")
+        return future.result()
+
+
+def writer_stats():
+    batches = _stats["batches"]
+    return {
+        "batches": batches,
+        "ops": _stats["ops"],
+        "failed": _stats["failed"],
+        "largest_batch": _stats["largest"],
+        "avg_batch": round(_stats["ops"] / batches, 2) if batches else 0.0,
+        "avg_commit_ms": round(_stats["commit_ms"] / batches, 2) if batches else 0.0,
+        "pending": _queue.qsize()
+    }
@@ -0,0 +1,96 @@
+import os
+import threading
+import cv2
+import face_recognition
+
+from config import (
+    FACE_DETECTOR,
+    DETECTION_UPSAMPLE,
+    LBP_CASCADE_FILE,
+    DNN_PROTOTXT_FILE,
+    DNN_MODEL_FILE,
+    DNN_CONFIDENCE
+)
+
+# All detectors take an RGB frame and return face_recognition-style
+# (top, right, bottom, left) boxes in that frame's pixel coordinates.
+
+
+# 🔹 dlib HOG (face_recognition default): accurate, slowest on CPU
+class HogDetector:
+    name = "hog"
+
+    def __init__(self, upsample=DETECTION_UPSAMPLE):
+        self.upsample = upsample
+
+    def detect(self, frame):
+        return face_recognition.face_locations(frame, number_of_times_to_upsample=self.upsample)
+
+
+# 🔹 OpenCV cascade (Haar or LBP): very cheap, more false positives
+class CascadeDetector:
+    def __init__(self, cascade_file, name, min_size=40):
+        if not os.path.exists(cascade_file):
+            raise FileNotFoundError(f"Cascade file not found: {cascade_file}")
+        self.name = name
+        self.cascade = cv2.CascadeClassifier(cascade_file)
+        self.min_size = min_size
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        rects = self.cascade.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=(self.min_size, self.min_size)
+        )
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in rects]
+
+
+# 🔹 OpenCV DNN SSD face detector (res10_300x300) on CPU
+class DnnDetector:
+    name = "dnn"
+
+    def __init__(self, prototxt=DNN_PROTOTXT_FILE, model=DNN_MODEL_FILE, confidence=DNN_CONFIDENCE):
+        for path in (prototxt, model):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN face model file not found: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model)
+        self.confidence = confidence
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        # The model was trained on BGR input with these per-channel means
+        bgr = cv2.cvtColor(cv2.resize(frame, (300, 300)), cv2.COLOR_RGB2BGR)
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        boxes = []
+        for det in detections:
+            if det[2] < self.confidence:
+                continue
+            left, top = max(0, int(det[3] * width)), max(0, int(det[4] * height))
+            right, bottom = min(width, int(det[5] * width)), min(height, int(det[6] * height))
+            if right > left and bottom > top:
+                boxes.append((top, right, bottom, left))
+        return boxes
+
+
+DETECTORS = {
+    "hog": lambda: HogDetector(),
+    "haar": lambda: CascadeDetector(cv2.data.haarcascades + "haarcascade_frontalface_default.xml", "haar"),
+    "lbp": lambda: CascadeDetector(LBP_CASCADE_FILE, "lbp"),
+    "dnn": lambda: DnnDetector()
+}
+
+# OpenCV cascades and nets are not thread-safe, so each thread builds its own
+_local = threading.local()
+
+
+def get_detector(name=FACE_DETECTOR):
+    cache = getattr(_local, "detectors", None)
+    if cache is None:
+        cache = _local.detectors = {}
+    if name not in cache:
+        if name not in DETECTORS:
+            raise ValueError(f"Unknown face detector '{name}', expected one of {sorted(DETECTORS)}")
+        cache[name] = DETECTORS[name]()
+    return cache[name]
@@ -0,0 +1,199 @@
+import base64
+from collections import Counter
+from datetime import datetime
+
+from config import EVENT_REPEAT_SECONDS, FACE_RECOGNITION_TOLERANCE
+from utils.attendance_utils import _archive_or_none
+from utils.db_writer import run_write
+
+# SQLite's default limit on bound parameters per statement
+_SQL_VARS = 900
+
+
+# 🔹 Validate one queued kiosk event
+# {"key": str, "kiosk_id": str, "timestamp": ISO string or epoch seconds,
+#  "encoding": [128 floats] | "image": "<base64 jpeg>"}; raises ValueError.
+def parse_event(raw):
+    from utils.face_utils import parse_encodings
+
+    if not isinstance(raw, dict):
+        raise ValueError("Event must be an object")
+    key = raw.get("key")
+    if not isinstance(key, str) or not key or len(key) > 128:
+        raise ValueError("Missing or invalid idempotency key")
+
+    stamp = raw.get("timestamp")
+    try:
+        if isinstance(stamp, (int, float)):
+            at = datetime.fromtimestamp(stamp)
+        else:
+            at = datetime.fromisoformat(str(stamp))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError("Missing or invalid timestamp")
+    # Stored and compared as local wall-clock time like every other scan
+    if at.tzinfo is not None:
+        at = at.astimezone().replace(tzinfo=None)
+
+    event = {"key": key, "kiosk_id": str(raw.get("kiosk_id") or ""), "at": at, "encoding": None, "image": None}
+    if raw.get("encoding") is not None:
+        event["encoding"] = parse_encodings(raw["encoding"])[0]
+    elif raw.get("image"):
+        try:
+            event["image"] = base64.b64decode(raw["image"], validate=True)
+        except ValueError:
+            raise ValueError("Image is not valid base64")
+    else:
+        raise ValueError("Event needs an encoding or an image")
+    return event
+
+
+def _seen_keys(conn, keys):
+    seen = set()
+    for i in range(0, len(keys), _SQL_VARS):
+        chunk = keys[i:i + _SQL_VARS]
+        marks = ",".join("?" * len(chunk))
+        seen.update(
+            row[0] for row in conn.execute(
+                f"SELECT idempotency_key FROM kiosk_events WHERE idempotency_key IN ({marks})", chunk
+            )
+        )
+    return seen
+
+
+# 🔹 Resolve emp_id for every event: one batched gallery match for all
+# encodings, images fanned out over the recognition pool
+def _identify(events):
+    import numpy as np
+    from utils.face_utils import get_gallery
+    from utils.recognition_pool import recognize_images
+
+    gallery = get_gallery()
+    with_encoding = [e for e in events if e["encoding"] is not None]
+    if with_encoding:
+        matches = gallery.match(np.stack([e["encoding"] for e in with_encoding]), FACE_RECOGNITION_TOLERANCE)
+        for event, match in zip(with_encoding, matches):
+            event["emp_id"] = match["emp_id"] if match and match["matched"] else None
+
+    with_image = [e for e in events if e["image"] is not None]
+    if with_image:
+        for event, out in zip(with_image, recognize_images([e["image"] for e in with_image])):
+            if "error" in out:
+                event["error"] = out["error"]
+                event["emp_id"] = None
+                continue
+            # Closest face wins, like a single-person kiosk scan
+            results = sorted(out["results"], key=lambda r: r["distance"])
+            event["emp_id"] = results[0]["emp_id"] if results else None
+
+
+# 🔹 Apply one identified event to its attendance row (inside the batch transaction)
+# Same rules as /mark_attendance + /confirm_timeout, with the kiosk's own
+# confirmation assumed: first scan of the day is Time In, a later one is
+# Time Out, nothing changes once checked out. A repeat within
+# EVENT_REPEAT_SECONDS of Time In is ignored, and an event older than the
+# recorded Time In (a kiosk that was offline) moves Time In earlier.
+def _apply_event(conn, rows, event):
+    emp_id, at = event["emp_id"], event["at"]
+    today = at.strftime("%Y-%m-%d")
+    time_now = at.strftime("%H:%M:%S")
+    timestamp = at.strftime("%Y%m%d_%H%M%S")
+
+    row = rows.get((emp_id, today))
+    if row is None:
+        found = conn.execute(
+            "SELECT id, time_in, time_out FROM attendance WHERE emp_id=? AND attendance_date=?",
+            (emp_id, today)
+        ).fetchone()
+        row = rows[(emp_id, today)] = dict(found) if found else None
+
+    if row is None:
+        picture = _archive_or_none(event["image"], f"{emp_id}_{timestamp}_timein.jpg")
+        cur = conn.execute(
+            "INSERT INTO attendance (emp_id, attendance_date, time_in, time_in_picture, status) VALUES (?, ?, ?, ?, ?)",
+            (emp_id, today, time_now, picture, "Present")
+        )
+        rows[(emp_id, today)] = {"id": cur.lastrowid, "time_in": time_now, "time_out": None}
+        return "time_in"
+
+    if time_now < row["time_in"]:
+        picture = _archive_or_none(event["image"], f"{emp_id}_{timestamp}_timein.jpg")
+        conn.execute("UPDATE attendance SET time_in=?, time_in_picture=? WHERE id=?", (time_now, picture, row["id"]))
+        row["time_in"] = time_now
+        return "time_in"
+
+    since_in = (at - datetime.strptime(f"{today} {row['time_in']}", "%Y-%m-%d %H:%M:%S")).total_seconds()
+    if since_in < EVENT_REPEAT_SECONDS:
+        return "repeat"
+
+    if row["time_out"]:
+        return "already_checked_out"
+
+    picture = _archive_or_none(event["image"], f"{emp_id}_{timestamp}_timeout.jpg")
+    conn.execute(
+        "UPDATE attendance SET time_out=?, time_out_picture=?, status=? WHERE id=?",
+        (time_now, picture, "Present", row["id"])
+    )
+    row["time_out"] = time_now
+    return "time_out"
+
+
+# 🔹 Apply a batch of queued kiosk events in one transaction
+# Returns one {"key", "status", ...} per input event, in input order. Keys
+# already stored (or repeated in the batch) come back as "duplicate" and
+# change nothing, so a kiosk can safely resend a whole batch. `conn` is only
+# read from; the writes go through the group-commit writer.
+def upload_events(conn, raw_events):
+    outcomes = [None] * len(raw_events)
+    events = []
+    for i, raw in enumerate(raw_events):
+        try:
+            event = parse_event(raw)
+        except ValueError as e:
+            key = raw.get("key") if isinstance(raw, dict) else None
+            outcomes[i] = {"key": key, "status": "invalid", "message": str(e)}
+            continue
+        event["index"] = i
+        events.append(event)
+
+    seen = _seen_keys(conn, [e["key"] for e in events])
+    fresh = []
+    for event in events:
+        if event["key"] in seen:
+            outcomes[event["index"]] = {"key": event["key"], "status": "duplicate"}
+        else:
+            seen.add(event["key"])
+            fresh.append(event)
+
+    _identify(fresh)
+    for event, status in run_write(_apply_events, fresh):
+        outcome = {"key": event["key"], "status": status}
+        if status != "duplicate":
+            outcome["emp_id"] = event["emp_id"]
+        if event.get("error"):
+            outcome["message"] = f"Image processing error: {event['error']}"
+        outcomes[event["index"]] = outcome
+
+    return outcomes, dict(Counter(o["status"] for o in outcomes))
+
+
+# Write op (one transaction): claim each key, then apply it. A key claimed by
+# a concurrent batch since the pre-check is reported as a duplicate.
+def _apply_events(conn, events):
+    rows, applied = {}, []
+    # Client time order, so Time In / Time Out resolve as they happened
+    for event in sorted(events, key=lambda e: e["at"]):
+        claimed = conn.execute(
+            "INSERT OR IGNORE INTO kiosk_events (idempotency_key, kiosk_id, client_ts, emp_id) VALUES (?, ?, ?, ?)",
+            (event["key"], event["kiosk_id"], event["at"].isoformat(sep=" "), event["emp_id"])
+        ).rowcount
+        if not claimed:
+            applied.append((event, "duplicate"))
+            continue
+
+        if event["emp_id"] is None:
+            status = "not_recognized"
+        else:
+            status = _apply_event(conn, rows, event)
+        conn.execute("UPDATE kiosk_events SET outcome=? WHERE idempotency_key=?", (status, event["key"]))
+        applied.append((event, status))
+    return applied
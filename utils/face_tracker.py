@@ -0,0 +1,128 @@
+import time
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+from config import TRACK_TTL, TRACK_MAX_AGE, TRACK_MIN_IOU, TRACK_MIN_SIMILARITY, TRACK_MAX_KIOSKS
+
+# Side of the grayscale thumbnail used as a track's appearance signature
+SIGNATURE_SIZE = 16
+
+
+def box_iou(a, b):
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, right - left) * max(0, bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter) if inter else 0.0
+
+
+# 🔹 Zero-mean, unit-norm thumbnail of a face box
+# The dot product of two signatures is their normalized correlation, which
+# guards against a different person stepping into the same spot.
+def face_signature(frame, location):
+    top, right, bottom, left = location
+    crop = frame[top:bottom, left:right]
+    if crop.size == 0:
+        return np.zeros(SIGNATURE_SIZE * SIGNATURE_SIZE, dtype=np.float32)
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+    thumb = cv2.resize(gray, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+    thumb = thumb.astype(np.float32).ravel()
+    thumb -= thumb.mean()
+    norm = np.linalg.norm(thumb)
+    return thumb / norm if norm else thumb
+
+
+# 🔹 Pair detected boxes with live tracks (runs in the recognition worker)
+# Returns {detection index: track} for boxes that overlap a track enough and
+# still look like the same face; those skip encoding and matching.
+def match_tracks(locations, signatures, tracks, min_iou=TRACK_MIN_IOU, min_similarity=TRACK_MIN_SIMILARITY):
+    pairs = []
+    for i, (location, signature) in enumerate(zip(locations, signatures)):
+        for j, track in enumerate(tracks):
+            iou = box_iou(location, track["location"])
+            if iou >= min_iou and float(signature @ track["signature"]) >= min_similarity:
+                pairs.append((iou, i, j))
+
+    matched, used = {}, set()
+    for _, i, j in sorted(pairs, reverse=True):
+        if i not in matched and j not in used:
+            matched[i] = tracks[j]
+            used.add(j)
+    return matched
+
+
+# 🔹 Identified faces seen recently at one kiosk (lives in the request process)
+class FaceTracker:
+    def __init__(self, ttl=TRACK_TTL, max_age=TRACK_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.tracks = {}
+        self.last_used = time.time()
+        self._lock = threading.Lock()
+
+    def _prune(self, now):
+        for emp_id in [e for e, t in self.tracks.items() if now - t["last_seen"] > self.ttl]:
+            del self.tracks[emp_id]
+
+    # No live tracks and not asked for any within the TTL
+    def idle(self, now):
+        with self._lock:
+            self._prune(now)
+            return not self.tracks and now - self.last_used > self.ttl
+
+    # Live tracks, shipped to the worker with the next frame. Tracks older
+    # than max_age are left out so the identity is re-verified periodically.
+    def snapshot(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._prune(now)
+            return [dict(t) for t in self.tracks.values() if now - t["first_seen"] <= self.max_age]
+
+    # Refresh tracks from a frame's recognition results
+    def update(self, results, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            for r in results:
+                if "signature" not in r:
+                    continue
+                track = self.tracks.get(r["emp_id"])
+                if track is None or not r.get("tracked"):
+                    # New or freshly re-encoded identity
+                    track = self.tracks[r["emp_id"]] = {
+                        "emp_id": r["emp_id"],
+                        "distance": r["distance"],
+                        "margin": r["margin"],
+                        "first_seen": now
+                    }
+                track["location"] = r["location"]
+                track["signature"] = r["signature"]
+                track["last_seen"] = now
+            self._prune(now)
+
+
+# kiosk_id -> FaceTracker, least recently used first. kiosk_id is a per-device
+# id the client generates, so idle trackers are dropped and the count is capped.
+_trackers = OrderedDict()
+_trackers_lock = threading.Lock()
+
+
+def _evict_trackers(now):
+    for kiosk_id in [k for k, t in _trackers.items() if t.idle(now)]:
+        del _trackers[kiosk_id]
+    while len(_trackers) >= TRACK_MAX_KIOSKS:
+        _trackers.popitem(last=False)
+
+
+def get_tracker(kiosk_id, now=None):
+    now = time.time() if now is None else now
+    with _trackers_lock:
+        tracker = _trackers.get(kiosk_id)
+        if tracker is None:
+            _evict_trackers(now)
+            tracker = _trackers[kiosk_id] = FaceTracker()
+        _trackers.move_to_end(kiosk_id)
+        tracker.last_used = now
+        return tracker
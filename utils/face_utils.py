@@ -1,22 +1,175 @@
 import os
 import pickle
+import threading
+import time
+from contextlib import contextmanager
+import cv2
+import numpy as np
 import face_recognition
+from config import (
+    FACE_RECOGNITION_TOLERANCE,
+    GALLERY_FILE,
+    DETECTION_SCALE
+)
 from utils.db_utils import get_db
+from utils.detectors import get_detector
+from utils.face_tracker import face_signature, match_tracks
+from utils.gallery import ENCODING_DIM, FaceGallery, load_gallery, save_gallery, with_ann_index
 from datetime import datetime
 
 # 🔹 Folder where staff images are stored
 FACE_DATA_FOLDER = "uploads/"
+# Legacy pickled {emp_id: encoding} dict, converted to GALLERY_FILE on first load
 ENCODINGS_FILE = "face_data/encodings.pkl"
 
-# 🔹 Load known face encodings from file
+# 🔹 Load known face encodings as a {emp_id: encoding} dict
 def load_encodings():
-    if os.path.exists(ENCODINGS_FILE):
-        with open(ENCODINGS_FILE, "rb") as f:
-            known_encodings = pickle.load(f)
-        return known_encodings
-    return {}
+    return get_gallery().to_dict()
 
-# 🔹 Encode all faces in the staff folder and save to encodings.pkl
+# 🔹 Process-resident gallery cache
+# Keyed on a version stamp of GALLERY_FILE. Every save atomically replaces the
+# header, so the inode/mtime change tells each worker process to re-map the
+# matrix once; all other scans reuse the same memory-mapped gallery.
+# "stamp" starts as a sentinel so the first call always loads (a missing
+# file has stamp None).
+_gallery_cache = {"stamp": object(), "gallery": FaceGallery([], [])}
+_gallery_lock = threading.Lock()
+
+
+# A worker forked while another thread held the lock would wait on it forever
+def _reset_gallery_lock():
+    global _gallery_lock
+    _gallery_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_gallery_lock)
+
+
+def encodings_version():
+    try:
+        st = os.stat(GALLERY_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def get_gallery():
+    stamp = encodings_version()
+    if stamp == _gallery_cache["stamp"]:
+        return _gallery_cache["gallery"]
+
+    with _gallery_lock:
+        return _load_gallery_locked()
+
+
+# Same as get_gallery() but for callers already holding _gallery_lock
+def _load_gallery_locked():
+    stamp = encodings_version()
+    if stamp is None and os.path.exists(ENCODINGS_FILE):
+        _migrate_legacy_encodings()
+        stamp = encodings_version()
+    if stamp != _gallery_cache["stamp"]:
+        _gallery_cache["gallery"] = load_gallery(GALLERY_FILE) or FaceGallery([], [])
+        _gallery_cache["stamp"] = stamp
+    return _gallery_cache["gallery"]
+
+
+# 🔹 One-time conversion of the old encodings.pkl into the binary gallery
+def _migrate_legacy_encodings():
+    with open(ENCODINGS_FILE, "rb") as f:
+        known_encodings = pickle.load(f)
+    save_gallery(FaceGallery.from_dict(known_encodings), GALLERY_FILE)
+    os.replace(ENCODINGS_FILE, f"{ENCODINGS_FILE}.migrated")
+    print(f"[✅] Migrated {len(known_encodings)} encodings from {ENCODINGS_FILE} to {GALLERY_FILE}")
+
+
+# 🔹 Cross-process writer lock (lock file works on Windows and Unix)
+# Serializes read-modify-write cycles so two workers enrolling at the same
+# time cannot drop each other's encoding.
+@contextmanager
+def encodings_write_lock(timeout=30, stale_after=120):
+    lock_path = f"{GALLERY_FILE}.lock"
+    os.makedirs(os.path.dirname(GALLERY_FILE), exist_ok=True)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.05)
+    try:
+        with _gallery_lock:
+            yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+# 🔹 Persist a new gallery and make it the current one in this process
+def _commit_gallery(gallery):
+    gallery = with_ann_index(gallery)
+    save_gallery(gallery, GALLERY_FILE)
+    _gallery_cache["gallery"] = gallery
+    _gallery_cache["stamp"] = encodings_version()
+
+
+# 🔹 Encode the first face in a single image file (None if no face found)
+# Enrollment photos are detected at full resolution with the configured backend
+def encode_image_file(image_file):
+    image = face_recognition.load_image_file(image_file)
+    encodings = face_recognition.face_encodings(image, detect_faces(image, scale=1.0))
+    return encodings[0] if encodings else None
+
+
+# 🔹 Add or replace one employee's encoding without touching anyone else
+def upsert_staff_encoding(emp_id, image_file):
+    if not image_file or not os.path.exists(image_file):
+        print(f"[⚠️] Missing image for emp_id {emp_id}: {image_file}")
+        return False
+
+    encoding = encode_image_file(image_file)
+    if encoding is None:
+        print(f"[❌] No face detected for emp_id {emp_id}")
+        return False
+
+    with encodings_write_lock():
+        _commit_gallery(_load_gallery_locked().upsert(emp_id, encoding))
+    print(f"[✅] Encoded emp_id {emp_id}")
+    return True
+
+
+# 🔹 Add many precomputed encodings in a single gallery write
+def upsert_staff_encodings(encodings_by_emp):
+    if not encodings_by_emp:
+        return 0
+    emp_ids = list(encodings_by_emp.keys())
+    with encodings_write_lock():
+        gallery = _load_gallery_locked()
+        _commit_gallery(gallery.upsert_many(emp_ids, [encodings_by_emp[e] for e in emp_ids]))
+    print(f"[✅] Added {len(emp_ids)} encodings to the gallery")
+    return len(emp_ids)
+
+
+# 🔹 Drop one employee's encoding from the gallery
+def remove_staff_encoding(emp_id):
+    with encodings_write_lock():
+        gallery = _load_gallery_locked()
+        if emp_id not in gallery.emp_ids:
+            return False
+        _commit_gallery(gallery.remove(emp_id))
+    print(f"[🗑] Removed encoding for emp_id {emp_id}")
+    return True
+
+# 🔹 Encode all faces in the staff folder and save to the gallery
+# Full rebuild; registration and deletion use the per-employee helpers above.
 def encode_faces():
     known_encodings = {}
     conn = get_db()
@@ -34,46 +187,154 @@ def encode_faces():
             continue
 
         try:
-            image = face_recognition.load_image_file(image_file)
-            encodings = face_recognition.face_encodings(image)
-            if encodings:
-                known_encodings[emp_id] = encodings[0]  # Take the first face
+            encoding = encode_image_file(image_file)
+            if encoding is not None:
+                known_encodings[emp_id] = encoding  # Take the first face
                 print(f"[✅] Encoded emp_id {emp_id}")
             else:
                 print(f"[❌] No face detected for emp_id {emp_id}")
         except Exception as e:
             print(f"[❌] Error encoding emp_id {emp_id}: {e}")
 
-    # Save encodings
-    os.makedirs(os.path.dirname(ENCODINGS_FILE), exist_ok=True)
-    with open(ENCODINGS_FILE, "wb") as f:
-        pickle.dump(known_encodings, f)
-    print(f"[✅] Successfully encoded {len(known_encodings)} staff faces and saved to {ENCODINGS_FILE}")
+    # Save encodings (bumps the version stamp picked up by get_gallery)
+    with encodings_write_lock():
+        _commit_gallery(FaceGallery.from_dict(known_encodings))
+    print(f"[✅] Successfully encoded {len(known_encodings)} staff faces and saved to {GALLERY_FILE}")
     return known_encodings
 
-# 🔹 Recognize face from a camera frame
-def recognize_faces_from_frame(frame, known_encodings):
-    # frame is already RGB from load_image_file
-    face_locations = face_recognition.face_locations(frame)
-    face_encodings = face_recognition.face_encodings(frame, face_locations)
+# 🔹 Decode uploaded image bytes straight to an RGB frame (no temp file)
+def decode_image(data):
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Unreadable image")
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+# 🔹 Detect faces on a downscaled copy and map boxes back to full resolution
+# Uses the configured detector backend (config.FACE_DETECTOR).
+# Returns (top, right, bottom, left) boxes in `frame` coordinates.
+def detect_faces(frame, scale=DETECTION_SCALE, detector=None):
+    detector = detector or get_detector()
+    if scale >= 1:
+        return detector.detect(frame)
+
+    small = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    height, width = frame.shape[:2]
+    locations = []
+    for top, right, bottom, left in detector.detect(small):
+        locations.append((
+            max(0, int(top / scale)),
+            min(width, int(right / scale)),
+            min(height, int(bottom / scale)),
+            max(0, int(left / scale))
+        ))
+    return locations
+
+
+# 🔹 Validate encodings computed on an edge kiosk
+# Accepts one 128-d list or a list of them; raises ValueError otherwise.
+def parse_encodings(raw):
+    try:
+        encodings = np.asarray(raw, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("Encodings must be numeric")
+    if encodings.ndim == 1:
+        encodings = encodings.reshape(1, -1)
+    if encodings.ndim != 2 or encodings.shape[1] != ENCODING_DIM or len(encodings) == 0:
+        raise ValueError(f"Expected one or more {ENCODING_DIM}-value encodings")
+    if not np.isfinite(encodings).all():
+        raise ValueError("Encodings contain NaN or infinite values")
+    return encodings
+
+
+# 🔹 Match pre-computed encodings (no detection / encoding step)
+# Same result shape as identify_faces, without a location.
+def match_encodings(encodings, known_encodings, tolerance=FACE_RECOGNITION_TOLERANCE):
+    gallery = known_encodings
+    if not isinstance(gallery, FaceGallery):
+        gallery = FaceGallery.from_dict(known_encodings)
+
+    return [
+        {"emp_id": m["emp_id"], "distance": m["distance"], "margin": m["margin"]}
+        for m in gallery.match(encodings, tolerance)
+        if m and m["matched"]
+    ]
 
-    recognized = []
 
-    for face_encoding, location in zip(face_encodings, face_locations):
-        for emp_id, known_encoding in known_encodings.items():
-            distance = face_recognition.face_distance([known_encoding], face_encoding)
-            # Lowered tolerance from 0.6 to 0.5 for better matching (smaller = stricter)
-            # Using 0.5 allows more similar matches
-            if distance[0] < 0.5:
-                recognized.append({
-                    "emp_id": emp_id,
-                    "location": location,
-                    "distance": distance[0]
-                })
-                break
+# 🔹 Identify already-detected faces in a frame
+# `known_encodings` may be a FaceGallery or the legacy {emp_id: encoding} dict.
+# Pass a dict as `timings` to receive encode/match durations in ms.
+# With `tracks` (a FaceTracker snapshot) faces continuing a live track reuse
+# its identity and skip encoding; results then carry "tracked" and the
+# appearance "signature" the tracker needs.
+def identify_faces(frame, face_locations, known_encodings, tolerance=FACE_RECOGNITION_TOLERANCE,
+                   timings=None, tracks=None):
+    started = time.perf_counter()
+
+    signatures, reused = [], {}
+    if tracks is not None:
+        signatures = [face_signature(frame, loc) for loc in face_locations]
+        reused = match_tracks(face_locations, signatures, tracks)
+    pending = [i for i in range(len(face_locations)) if i not in reused]
+
+    # Landmarks + encodings use the full-resolution pixels
+    face_encodings = face_recognition.face_encodings(frame, [face_locations[i] for i in pending])
+    encoded = time.perf_counter()
+
+    gallery = known_encodings
+    if not isinstance(gallery, FaceGallery):
+        gallery = FaceGallery.from_dict(known_encodings)
+
+    by_index = {}
+    for i, track in reused.items():
+        by_index[i] = {
+            "emp_id": track["emp_id"],
+            "distance": track["distance"],
+            "margin": track["margin"],
+            "tracked": True
+        }
+
+    # All new faces are matched against the whole gallery in one batched call
+    matches = gallery.match(face_encodings, tolerance)
+    for i, match in zip(pending, matches):
+        if match and match["matched"]:
+            by_index[i] = {
+                "emp_id": match["emp_id"],
+                "distance": match["distance"],
+                "margin": match["margin"],
+                "tracked": False
+            }
+
+    if timings is not None:
+        timings["encode_ms"] = (encoded - started) * 1000
+        timings["match_ms"] = (time.perf_counter() - encoded) * 1000
+
+    recognized = []
+    for i in sorted(by_index):
+        result = by_index[i]
+        result["location"] = face_locations[i]
+        if tracks is not None:
+            result["signature"] = signatures[i]
+        else:
+            del result["tracked"]
+        recognized.append(result)
 
     return recognized
 
+
+# 🔹 Recognize face from a camera frame
+# Detection on a downscaled copy, then identify_faces (see above); `timings`
+# additionally receives detect_ms.
+def recognize_faces_from_frame(frame, known_encodings, tolerance=FACE_RECOGNITION_TOLERANCE,
+                               scale=DETECTION_SCALE, timings=None, tracks=None):
+    started = time.perf_counter()
+    # frame is already RGB from load_image_file
+    face_locations = detect_faces(frame, scale)
+    if timings is not None:
+        timings["detect_ms"] = (time.perf_counter() - started) * 1000
+
+    return identify_faces(frame, face_locations, known_encodings, tolerance, timings, tracks)
+
 # 🔹 Mark attendance automatically
 def mark_attendance(emp_id):
     conn = get_db()
@@ -0,0 +1,54 @@
+import threading
+import cv2
+import numpy as np
+
+from config import (
+    QUALITY_MIN_BRIGHTNESS,
+    QUALITY_MAX_BRIGHTNESS,
+    QUALITY_MIN_SHARPNESS,
+    QUALITY_FACE_PROBE
+)
+
+# Cascade objects are not safe to share between threads
+_local = threading.local()
+
+
+def _cascade():
+    cascade = getattr(_local, "cascade", None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        _local.cascade = cascade
+    return cascade
+
+
+# 🔹 Cheap pre-check run before the dlib pipeline
+# Decodes a 1/4-scale grayscale copy straight from the JPEG (a few ms) and
+# rejects dark, washed-out, blurry or empty frames. Returns
+# (ok, reason, metrics) where reason is None or one of "unreadable",
+# "too_dark", "too_bright", "blurry", "no_face".
+def check_frame(image_bytes, face_probe=QUALITY_FACE_PROBE):
+    gray = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if gray is None:
+        return False, "unreadable", {}
+
+    brightness = float(gray.mean())
+    metrics = {"brightness": round(brightness, 1)}
+    if brightness < QUALITY_MIN_BRIGHTNESS:
+        return False, "too_dark", metrics
+    if brightness > QUALITY_MAX_BRIGHTNESS:
+        return False, "too_bright", metrics
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    metrics["sharpness"] = round(sharpness, 1)
+    if sharpness < QUALITY_MIN_SHARPNESS:
+        return False, "blurry", metrics
+
+    if face_probe:
+        # Lenient settings: this only has to tell "someone is there" from an
+        # idle kiosk; HOG does the real detection afterwards
+        faces = _cascade().detectMultiScale(gray, scaleFactor=1.2, minNeighbors=2, minSize=(32, 32))
+        metrics["faces"] = len(faces)
+        if len(faces) == 0:
+            return False, "no_face", metrics
+
+    return True, None, metrics
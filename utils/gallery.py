@@ -0,0 +1,288 @@
+import os
+import json
+import numpy as np
+
+from config import (
+    FACE_RECOGNITION_TOLERANCE,
+    FACE_MATCHER,
+    ANN_MIN_GALLERY_SIZE,
+    ANN_NLIST,
+    ANN_NPROBE
+)
+from utils.ann_index import IVFIndex
+
+# dlib's face embedding size
+ENCODING_DIM = 128
+# float32 halves the footprint of dlib's float64 output with no effect on matching
+GALLERY_DTYPE = np.float32
+GALLERY_FORMAT = 1
+
+# 🔹 Known staff faces held as one contiguous (N, 128) matrix
+# `matrix` may be a read-only np.memmap; it is never modified in place.
+# `ivf` is an optional IVFIndex over the rows (see utils/ann_index.py).
+class FaceGallery:
+    def __init__(self, emp_ids, matrix, version=0, ivf=None):
+        self.version = version
+        self.emp_ids = np.asarray(emp_ids, dtype=np.int64)
+        self.matrix = np.ascontiguousarray(matrix, dtype=GALLERY_DTYPE).reshape(len(self.emp_ids), ENCODING_DIM)
+        self.ivf = None
+        if ivf is not None:
+            self._attach_ivf(ivf)
+        # Squared norms are reused by every match call
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+
+    # Rows are kept grouped by IVF bucket so each bucket is a contiguous slice.
+    # Galleries loaded from disk are saved sorted, so this only copies after
+    # an in-memory update or a fresh build.
+    def _attach_ivf(self, ivf):
+        if not ivf.is_sorted:
+            order = ivf.order()
+            self.emp_ids = self.emp_ids[order]
+            self.matrix = np.ascontiguousarray(self.matrix[order])
+            ivf = ivf.permuted(order)
+        self.ivf = ivf
+
+    @classmethod
+    def from_dict(cls, known_encodings):
+        emp_ids = list(known_encodings.keys())
+        if not emp_ids:
+            return cls([], np.empty((0, ENCODING_DIM)))
+        matrix = np.stack([np.asarray(known_encodings[e]) for e in emp_ids])
+        return cls(emp_ids, matrix)
+
+    def __len__(self):
+        return len(self.emp_ids)
+
+    def __bool__(self):
+        return len(self.emp_ids) > 0
+
+    # 🔹 Copy-on-write updates: readers holding the old gallery are unaffected
+    def upsert(self, emp_id, encoding):
+        encoding = np.asarray(encoding, dtype=GALLERY_DTYPE).reshape(1, ENCODING_DIM)
+        hits = np.flatnonzero(self.emp_ids == emp_id)
+        if hits.size:
+            matrix = self.matrix.copy()
+            matrix[hits[0]] = encoding
+            ivf = self.ivf.with_replaced_row(hits[0], encoding) if self.ivf else None
+            return FaceGallery(self.emp_ids, matrix, ivf=ivf)
+        ivf = self.ivf.with_rows(None, encoding) if self.ivf else None
+        return FaceGallery(np.append(self.emp_ids, emp_id), np.vstack([self.matrix, encoding]), ivf=ivf)
+
+    def upsert_many(self, emp_ids, encodings):
+        emp_ids = np.asarray(emp_ids, dtype=np.int64)
+        keep = ~np.isin(self.emp_ids, emp_ids)
+        matrix = np.asarray(encodings, dtype=GALLERY_DTYPE).reshape(len(emp_ids), ENCODING_DIM)
+        return FaceGallery(
+            np.concatenate([self.emp_ids[keep], emp_ids]),
+            np.vstack([self.matrix[keep], matrix]),
+            ivf=self.ivf.with_rows(keep, matrix) if self.ivf else None
+        )
+
+    def remove(self, emp_id):
+        keep = self.emp_ids != emp_id
+        ivf = self.ivf.with_rows(keep, []) if self.ivf else None
+        return FaceGallery(self.emp_ids[keep], self.matrix[keep], ivf=ivf)
+
+    def to_dict(self):
+        return {int(e): row for e, row in zip(self.emp_ids, self.matrix)}
+
+    # 🔹 Euclidean distances from every face to the gallery, shape (F, N)
+    # Restricted to the given row indices when `rows` is passed.
+    def distances(self, face_encodings, rows=None):
+        faces = np.asarray(face_encodings, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_DIM)
+        matrix, sq_norms = self.matrix, self.sq_norms
+        if rows is not None:
+            matrix, sq_norms = matrix[rows], sq_norms[rows]
+        face_sq = np.einsum("ij,ij->i", faces, faces)
+        sq = face_sq[:, None] + sq_norms[None, :] - 2 * (faces @ matrix.T)
+        np.maximum(sq, 0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    # 🔹 Closest gallery entry for each face
+    # Returns one dict per face (or None when the gallery is empty) with the
+    # best emp_id, its distance, the margin to the runner-up and whether the
+    # distance is within tolerance. With an IVF index only the `nprobe`
+    # closest buckets are scanned; distances to those rows are still exact.
+    def match(self, face_encodings, tolerance=FACE_RECOGNITION_TOLERANCE, nprobe=ANN_NPROBE):
+        if len(face_encodings) == 0:
+            return []
+        if not self:
+            return [None] * len(face_encodings)
+
+        if self.ivf is not None:
+            best, best_dist, second_dist = self._search_ivf(face_encodings, nprobe)
+        else:
+            best, best_dist, second_dist = self._search_exact(face_encodings)
+
+        return [
+            {
+                "emp_id": int(self.emp_ids[b]),
+                "distance": float(d),
+                "margin": float(s - d),
+                "matched": bool(d < tolerance),
+            }
+            for b, d, s in zip(best, best_dist, second_dist)
+        ]
+
+    def _search_exact(self, face_encodings):
+        dist = self.distances(face_encodings)
+        faces = np.arange(dist.shape[0])
+        best = np.argmin(dist, axis=1)
+        best_dist = dist[faces, best]
+        dist[faces, best] = np.inf
+        second_dist = dist.min(axis=1) if dist.shape[1] > 1 else np.full(len(faces), np.inf)
+        return best, best_dist, second_dist
+
+    def _search_ivf(self, face_encodings, nprobe):
+        faces = np.asarray(face_encodings, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_DIM)
+        best = np.zeros(len(faces), dtype=np.int64)
+        best_dist = np.full(len(faces), np.inf)
+        second_dist = np.full(len(faces), np.inf)
+        for i, face in enumerate(faces):
+            face_sq = float(face @ face)
+            for start, end in self.ivf.probe(face, nprobe):
+                sq = face_sq + self.sq_norms[start:end] - 2 * (self.matrix[start:end] @ face)
+                top = np.argpartition(sq, 1)[:2] if sq.size > 1 else np.array([0])
+                for j in top:
+                    d = np.sqrt(max(sq[j], 0))
+                    if d < best_dist[i]:
+                        second_dist[i] = best_dist[i]
+                        best[i], best_dist[i] = start + j, d
+                    elif d < second_dist[i]:
+                        second_dist[i] = d
+        return best, best_dist, second_dist
+
+
+# =====================================================
+# ON-DISK FORMAT
+# =====================================================
+# gallery.json                  header: format, version, dim, count, dtype and
+#                               the names of the two data files below
+# gallery.v<N>.npy              float32 (count, dim) encoding matrix
+# gallery.v<N>.ids.npy          int64 emp_id for each matrix row
+# gallery.v<N>.centroids.npy    optional IVF centroids (nlist, dim)
+# gallery.v<N>.lists.npy        optional IVF list number for each matrix row
+#
+# Data files are never rewritten: each save writes a new version and then
+# atomically replaces the header, so a reader always sees one complete
+# version. Workers memory-map the matrix read-only and share the page cache.
+
+def _ann_applies(size, matcher, min_size):
+    return matcher == "ivf" and size >= min_size
+
+
+# 🔹 Attach, keep or drop the IVF index according to config
+# The index is retrained when missing or once the gallery has doubled since
+# training; otherwise incremental updates keep assigning rows to the
+# existing centroids. A new index goes through the constructor so the rows
+# are regrouped by bucket (and saved that way).
+def with_ann_index(gallery, matcher=FACE_MATCHER, min_size=ANN_MIN_GALLERY_SIZE, nlist=ANN_NLIST):
+    if not _ann_applies(len(gallery), matcher, min_size):
+        if gallery.ivf is None:
+            return gallery
+        return FaceGallery(gallery.emp_ids, gallery.matrix, version=gallery.version)
+    if gallery.ivf is None or len(gallery) > 2 * gallery.ivf.trained_size:
+        gallery = FaceGallery(gallery.emp_ids, gallery.matrix, version=gallery.version,
+                              ivf=IVFIndex.build(gallery.matrix, nlist=nlist))
+        print(f"[✅] Built IVF index with {gallery.ivf.nlist} lists over {len(gallery)} faces")
+    return gallery
+
+
+def read_gallery_header(header_file):
+    try:
+        with open(header_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# A stored IVF index is only attached while config still asks for it, so
+# switching FACE_MATCHER back to "exact" takes effect on the next load
+def load_gallery(header_file, mmap=True, matcher=FACE_MATCHER, min_size=ANN_MIN_GALLERY_SIZE):
+    header = read_gallery_header(header_file)
+    if header is None:
+        return None
+
+    folder = os.path.dirname(header_file)
+    emp_ids = np.load(os.path.join(folder, header["ids"]))
+    if header["count"] == 0:
+        matrix = np.empty((0, header["dim"]), dtype=GALLERY_DTYPE)
+    else:
+        matrix = np.load(os.path.join(folder, header["matrix"]), mmap_mode="r" if mmap else None)
+
+    ivf = None
+    if header.get("ivf") and _ann_applies(header["count"], matcher, min_size):
+        ivf = IVFIndex(
+            np.load(os.path.join(folder, header["ivf"]["centroids"])),
+            np.load(os.path.join(folder, header["ivf"]["lists"])),
+            header["ivf"]["trained_size"]
+        )
+    return FaceGallery(emp_ids, matrix, version=header["version"], ivf=ivf)
+
+
+def _write_npy(path, array):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def save_gallery(gallery, header_file):
+    folder = os.path.dirname(header_file)
+    os.makedirs(folder, exist_ok=True)
+
+    previous = read_gallery_header(header_file)
+    version = (previous["version"] if previous else 0) + 1
+    stem = os.path.splitext(os.path.basename(header_file))[0]
+
+    header = {
+        "format": GALLERY_FORMAT,
+        "version": version,
+        "dim": ENCODING_DIM,
+        "count": len(gallery),
+        "dtype": np.dtype(GALLERY_DTYPE).name,
+        "matrix": f"{stem}.v{version}.npy",
+        "ids": f"{stem}.v{version}.ids.npy"
+    }
+    _write_npy(os.path.join(folder, header["matrix"]), gallery.matrix.astype(GALLERY_DTYPE, copy=False))
+    _write_npy(os.path.join(folder, header["ids"]), gallery.emp_ids)
+
+    if gallery.ivf is not None:
+        header["ivf"] = {
+            "centroids": f"{stem}.v{version}.centroids.npy",
+            "lists": f"{stem}.v{version}.lists.npy",
+            "trained_size": gallery.ivf.trained_size
+        }
+        _write_npy(os.path.join(folder, header["ivf"]["centroids"]), gallery.ivf.centroids)
+        _write_npy(os.path.join(folder, header["ivf"]["lists"]), gallery.ivf.assignments)
+
+    tmp_path = f"{header_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, header_file)
+
+    _prune_versions(folder, stem, keep={version, version - 1})
+    gallery.version = version
+    return version
+
+
+# Older versions are removed once two newer ones exist; a reader that opened
+# the previous version just before the header swap can still finish with it.
+def _prune_versions(folder, stem, keep):
+    prefix = f"{stem}.v"
+    for name in os.listdir(folder):
+        if not name.startswith(prefix) or not name.endswith(".npy"):
+            continue
+        try:
+            file_version = int(name[len(prefix):].split(".", 1)[0])
+        except ValueError:
+            continue
+        if file_version not in keep:
+            try:
+                os.remove(os.path.join(folder, name))
+            except OSError:
+                pass
@@ -0,0 +1,141 @@
+import os
+import csv
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from werkzeug.utils import secure_filename
+
+from config import UPLOAD_FOLDER, ALLOWED_EXTENSIONS
+from utils.db_utils import connect_db
+
+# Columns copied from the CSV into the staff table; `image` names the photo in the ZIP
+STAFF_COLUMNS = ["name", "email", "phone", "department", "gender", "joining_date", "dob", "native"]
+
+
+# 🔹 Runs in a pool worker: detect + encode one photo
+# Returns (status, encoding) where status is "ok", "no_face",
+# "multiple_faces" or "unreadable: <error>".
+def _encode_import_image(image_file):
+    import face_recognition
+    from utils.face_utils import detect_faces
+    try:
+        image = face_recognition.load_image_file(image_file)
+        locations = detect_faces(image, scale=1.0)
+    except Exception as e:
+        return f"unreadable: {e}", None
+
+    if not locations:
+        return "no_face", None
+    if len(locations) > 1:
+        return "multiple_faces", None
+
+    encodings = face_recognition.face_encodings(image, locations)
+    if not encodings:
+        return "no_face", None
+    return "ok", encodings[0]
+
+
+# 🔹 Read the CSV and pull each referenced photo out of the ZIP
+# Returns (rows, failures); every row keeps its 1-based CSV line number.
+def _prepare_rows(csv_path, zip_path, upload_folder):
+    rows, failures = [], []
+    stamp = datetime.now().timestamp()
+
+    with zipfile.ZipFile(zip_path) as zf:
+        # Match photos by base name so folders inside the ZIP don't matter
+        members = {os.path.basename(n): n for n in zf.namelist() if not n.endswith("/")}
+
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            for line_no, raw in enumerate(csv.DictReader(f), start=2):
+                row = {k.strip().lower(): (v or "").strip() for k, v in raw.items() if k}
+                name = row.get("name")
+                image_name = os.path.basename(row.get("image", ""))
+
+                if not name:
+                    failures.append({"row": line_no, "name": name, "reason": "missing name"})
+                    continue
+                if image_name not in members:
+                    failures.append({"row": line_no, "name": name, "reason": f"image not in zip: {image_name}"})
+                    continue
+                ext = image_name.rsplit(".", 1)[-1].lower() if "." in image_name else ""
+                if ext not in ALLOWED_EXTENSIONS:
+                    failures.append({"row": line_no, "name": name, "reason": "invalid image format"})
+                    continue
+
+                filename = secure_filename(f"{name}_{stamp}_{line_no}.{ext}")
+                image_path = os.path.join(upload_folder, filename)
+                with zf.open(members[image_name]) as src, open(image_path, "wb") as dst:
+                    dst.write(src.read())
+
+                row["row"] = line_no
+                row["image_path"] = image_path
+                rows.append(row)
+
+    return rows, failures
+
+
+# 🔹 Bulk import staff from a CSV + ZIP of photos
+# Face encoding fans out over a process pool (`pool`, or one started for
+# the import); all accepted staff rows are inserted in one transaction and
+# added to the gallery in one write.
+def import_staff(csv_path, zip_path, workers=None, upload_folder=UPLOAD_FOLDER, pool=None):
+    from utils.face_utils import upsert_staff_encodings
+
+    started = time.perf_counter()
+    os.makedirs(upload_folder, exist_ok=True)
+    rows, failures = _prepare_rows(csv_path, zip_path, upload_folder)
+
+    workers = workers or os.cpu_count() or 1
+    if rows:
+        chunksize = max(1, len(rows) // (workers * 4))
+        images = [r["image_path"] for r in rows]
+        if pool is not None:
+            results = list(pool.map(_encode_import_image, images, chunksize=chunksize))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as own_pool:
+                results = list(own_pool.map(_encode_import_image, images, chunksize=chunksize))
+    else:
+        results = []
+
+    accepted = []
+    for row, (status, encoding) in zip(rows, results):
+        if status == "ok":
+            accepted.append((row, encoding))
+        else:
+            failures.append({"row": row["row"], "name": row["name"], "reason": status})
+            if os.path.exists(row["image_path"]):
+                os.remove(row["image_path"])
+
+    # ---------- DB INSERT (single transaction) ----------
+    encodings_by_emp = {}
+    conn = connect_db()
+    try:
+        with conn:
+            for row, encoding in accepted:
+                cur = conn.execute("""
+                    INSERT INTO staff (
+                        name, email, phone, department,
+                        gender, joining_date, dob, native, image_path
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, tuple(row.get(c) or None for c in STAFF_COLUMNS) + (row["image_path"],))
+                encodings_by_emp[cur.lastrowid] = encoding
+    except Exception:
+        for row, _ in accepted:
+            if os.path.exists(row["image_path"]):
+                os.remove(row["image_path"])
+        raise
+    finally:
+        conn.close()
+
+    # ---------- UPDATE FACE MODEL ----------
+    upsert_staff_encodings(encodings_by_emp)
+
+    failures.sort(key=lambda f: f["row"])
+    return {
+        "imported": len(encodings_by_emp),
+        "failed": failures,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - started, 2)
+    }
@@ -0,0 +1,279 @@
+import time
+import queue
+import threading
+import cv2
+
+from config import LIVE_CAMERA_ID, LIVE_QUEUE_SIZE, LIVE_COOLDOWN, LIVE_CAPTURE_SOURCE
+from utils.face_utils import get_gallery, detect_faces, identify_faces
+from utils.face_tracker import get_tracker
+from utils.attendance_utils import apply_group_scan
+
+STAGES = ["capture", "decode", "detect", "encode", "write"]
+
+# Pushed down the pipeline when the source ends or stop() is called
+_STOP = object()
+
+
+# 🔹 Bounded queue that drops the oldest item instead of blocking the producer
+# A live camera must never wait on a slow stage: stale frames are worthless,
+# so the newest frame always gets in.
+class DropOldestQueue(queue.Queue):
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        self.dropped = 0
+
+    def put_latest(self, item):
+        while True:
+            try:
+                self.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+
+# 🔹 "0" -> device 0, anything else is a stream URL or a file path
+def parse_source(source):
+    source = str(source).strip()
+    return int(source) if source.isdigit() else source
+
+
+def _is_file_source(source):
+    return isinstance(source, str) and "://" not in source
+
+
+# 🔹 Capture -> decode -> detect -> encode/match -> DB write, one thread each
+# Frame stages are linked by DropOldestQueues so a slow stage sheds load
+# instead of building latency: capture keeps the camera buffer drained while
+# detection and encoding (the bottleneck) always work on the newest frame.
+# Recognized people are never shed: the write queue blocks instead, so a slow
+# database holds back encoding (and frames are dropped upstream of it).
+class LivePipeline:
+    def __init__(self, source, camera_id=LIVE_CAMERA_ID, queue_size=LIVE_QUEUE_SIZE,
+                 cooldown=LIVE_COOLDOWN, record=True, pace=None):
+        self.source = parse_source(source)
+        self.camera_id = camera_id
+        self.cooldown = cooldown
+        self.record = record
+        # Replay files at their native frame rate so they behave like a camera
+        self.pace = _is_file_source(self.source) if pace is None else pace
+
+        self.queues = {s: DropOldestQueue(queue_size) for s in STAGES[1:-1]}
+        self.queues["write"] = queue.Queue(queue_size)
+        self.counters = {s: {"frames": 0, "total_ms": 0.0, "last_ms": 0.0} for s in STAGES}
+        self.counters["detect"]["faces"] = 0
+        self.counters["encode"]["tracked"] = 0
+        self.counters["write"]["recorded"] = 0
+        self.latency = {"frames": 0, "total_ms": 0.0, "last_ms": 0.0}
+        self.last_seen = {}
+        self.started = None
+        self.error = None
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    # ---------- counters ----------
+    def _count(self, stage, started, **extra):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            c = self.counters[stage]
+            c["frames"] += 1
+            c["total_ms"] += elapsed
+            c["last_ms"] = elapsed
+            for key, value in extra.items():
+                c[key] += value
+
+    def stats(self):
+        with self._lock:
+            stages = {}
+            for stage in STAGES:
+                c = dict(self.counters[stage])
+                c["avg_ms"] = round(c["total_ms"] / c["frames"], 2) if c["frames"] else 0.0
+                c["total_ms"] = round(c["total_ms"], 2)
+                c["last_ms"] = round(c["last_ms"], 2)
+                if stage in self.queues:
+                    c["queued"] = self.queues[stage].qsize()
+                    c["dropped"] = getattr(self.queues[stage], "dropped", 0)
+                stages[stage] = c
+            frames = self.latency["frames"]
+            elapsed = time.time() - self.started if self.started else 0.0
+            return {
+                "camera_id": self.camera_id,
+                "source": str(self.source),
+                "running": self.running,
+                "error": self.error,
+                "seconds": round(elapsed, 1),
+                "capture_fps": round(stages["capture"]["frames"] / elapsed, 2) if elapsed else 0.0,
+                "stages": stages,
+                "end_to_end_ms": {
+                    "avg": round(self.latency["total_ms"] / frames, 2) if frames else 0.0,
+                    "last": round(self.latency["last_ms"], 2)
+                }
+            }
+
+    # ---------- stages ----------
+    def _capture(self):
+        cap = cv2.VideoCapture(self.source)
+        try:
+            if not cap.isOpened():
+                self.error = f"Cannot open video source: {self.source}"
+                print(f"[❌] {self.error}")
+                return
+            interval = 0.0
+            if self.pace:
+                fps = cap.get(cv2.CAP_PROP_FPS)
+                interval = 1.0 / fps if fps and fps > 0 else 0.0
+
+            next_frame = time.perf_counter()
+            while not self._stop.is_set():
+                t0 = time.perf_counter()
+                ok, frame = cap.read()
+                if not ok:
+                    if _is_file_source(self.source):
+                        print(f"[✅] End of video: {self.source}")
+                    else:
+                        self.error = f"Lost video source: {self.source}"
+                        print(f"[⚠️] {self.error}")
+                    break
+                self._count("capture", t0)
+                self.queues["decode"].put_latest((time.perf_counter(), frame))
+
+                if interval:
+                    next_frame += interval
+                    delay = next_frame - time.perf_counter()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    else:
+                        next_frame = time.perf_counter()
+        finally:
+            cap.release()
+            self.queues["decode"].put_latest(_STOP)
+
+    def _stage(self, name, work, out):
+        inbox = self.queues[name]
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                if out:
+                    self._send(out, _STOP)
+                return
+            try:
+                result = work(*item)
+            except Exception as e:
+                print(f"LIVE {name.upper()} ERROR: {e}")
+                continue
+            if result is not None and out:
+                self._send(out, result)
+
+    def _send(self, stage, item):
+        outbox = self.queues[stage]
+        if isinstance(outbox, DropOldestQueue):
+            outbox.put_latest(item)
+        else:
+            outbox.put(item)
+
+    def _decode(self, captured, frame):
+        t0 = time.perf_counter()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self._count("decode", t0)
+        return captured, rgb
+
+    def _detect(self, captured, rgb):
+        t0 = time.perf_counter()
+        locations = detect_faces(rgb)
+        self._count("detect", t0, faces=len(locations))
+        # Empty frames stop here
+        return (captured, rgb, locations) if locations else None
+
+    def _encode(self, captured, rgb, locations):
+        t0 = time.perf_counter()
+        tracker = get_tracker(self.camera_id)
+        results = identify_faces(rgb, locations, get_gallery(), tracks=tracker.snapshot())
+        tracker.update(results)
+        for r in results:
+            r.pop("signature", None)
+        self._count("encode", t0, tracked=sum(1 for r in results if r["tracked"]))
+
+        # One record per person per cooldown window; the write stage releases
+        # the slot again if the record fails
+        now = time.time()
+        with self._lock:
+            fresh = [r for r in results if now - self.last_seen.get(r["emp_id"], 0) >= self.cooldown]
+            for r in fresh:
+                self.last_seen[r["emp_id"]] = now
+        if not fresh:
+            return None
+        return captured, rgb, fresh
+
+    def _write(self, captured, rgb, results):
+        t0 = time.perf_counter()
+        recorded = 0
+        if self.record:
+            ok, jpeg = cv2.imencode(".jpg", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+            try:
+                response = apply_group_scan(results, jpeg.tobytes() if ok else None)
+            except Exception:
+                # Not recorded: let the next frame with these people try again
+                with self._lock:
+                    for r in results:
+                        self.last_seen.pop(r["emp_id"], None)
+                raise
+            for person in response.get("people", []):
+                if person["action"] in ("time_in", "time_out"):
+                    recorded += 1
+                    print(f"[✅] {self.camera_id}: {person['name']} {person['action']}")
+        self._count("write", t0, recorded=recorded)
+
+        elapsed = (time.perf_counter() - captured) * 1000
+        with self._lock:
+            self.latency["frames"] += 1
+            self.latency["total_ms"] += elapsed
+            self.latency["last_ms"] = elapsed
+
+    # ---------- control ----------
+    def start(self):
+        self.started = time.time()
+        targets = [
+            ("capture", self._capture),
+            ("decode", lambda: self._stage("decode", self._decode, "detect")),
+            ("detect", lambda: self._stage("detect", self._detect, "encode")),
+            ("encode", lambda: self._stage("encode", self._encode, "write")),
+            ("write", lambda: self._stage("write", self._write, None))
+        ]
+        for name, target in targets:
+            t = threading.Thread(target=target, name=f"live-{self.camera_id}-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[✅] Live capture started: {self.camera_id} <- {self.source}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads)
+
+
+_pipeline = None
+
+
+# 🔹 Start the configured camera inside the web app process
+def start_live_capture(source=LIVE_CAPTURE_SOURCE, camera_id=LIVE_CAMERA_ID):
+    global _pipeline
+    if not source or (_pipeline is not None and _pipeline.running):
+        return _pipeline
+    _pipeline = LivePipeline(source, camera_id).start()
+    return _pipeline
+
+
+def live_stats():
+    return _pipeline.stats() if _pipeline is not None else None
@@ -0,0 +1,260 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import RECOGNITION_WORKERS, RECOGNITION_JOB_TTL, TRACKING_ENABLED, WRITE_BATCH_MAX
+from utils.face_tracker import get_tracker
+
+STAGES = ["queue_ms", "decode_ms", "detect_ms", "encode_ms", "match_ms", "record_ms", "total_ms"]
+
+
+# =====================================================
+# WORKER PROCESS SIDE
+# =====================================================
+# Each worker memory-maps the shared gallery and re-checks its version stamp
+# per job, so new registrations are picked up without restarting the pool.
+
+def _warm_worker():
+    from utils.face_utils import get_gallery
+    get_gallery()
+
+
+def _recognize_in_worker(image_bytes, tracks=None):
+    from utils.face_utils import get_gallery, decode_image, recognize_faces_from_frame
+
+    started = time.time()
+    timings = {}
+    t0 = time.perf_counter()
+    try:
+        frame = decode_image(image_bytes)
+    except Exception as e:
+        return {"error": str(e), "started": started, "timings": timings}
+    timings["decode_ms"] = (time.perf_counter() - t0) * 1000
+
+    results = recognize_faces_from_frame(frame, get_gallery(), timings=timings, tracks=tracks)
+    return {"results": results, "started": started, "timings": timings}
+
+
+# =====================================================
+# REQUEST PROCESS SIDE
+# =====================================================
+
+class RecognitionJob:
+    def __init__(self, image_bytes, handler, tracker=None, tracks=None):
+        self.id = uuid.uuid4().hex
+        self.image_bytes = image_bytes
+        self.handler = handler
+        self.tracker = tracker
+        self.tracks = tracks
+        self.submitted = time.time()
+        self.finished = None
+        self.response = None
+        self.http_status = 200
+        self.timings = {}
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        if not self.done:
+            return {"status": "pending", "job_id": self.id}
+        return {**self.response, "job_id": self.id}
+
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+# Threads that apply finished recognitions, so the process pool's result
+# thread is never blocked on SQLite. They only wait on the group-commit
+# writer, so several of them let a burst of scans share one commit.
+_recorder = ThreadPoolExecutor(max_workers=WRITE_BATCH_MAX, thread_name_prefix="scan-recorder")
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "faces": 0,
+    "tracked_faces": 0,
+    "totals": {s: 0.0 for s in STAGES},
+    "counts": {s: 0 for s in STAGES},
+    "last": {}
+}
+
+
+def _get_executor():
+    global _executor, _executor_workers
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = RECOGNITION_WORKERS or os.cpu_count() or 1
+                # fork keeps `python app.py` from being re-imported in every worker;
+                # platforms without fork (Windows) fall back to spawn
+                method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+                executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_warm_worker
+                )
+                # The workers are forked by the first submit, so do it here
+                executor.submit(os.getpid)
+                _executor, _executor_workers = executor, workers
+                print(f"[✅] Recognition pool started with {workers} workers ({method})")
+    return _executor
+
+
+# 🔹 Fork the recognition workers now
+# A fork copies the process mid-flight, including locks other threads hold,
+# so app.py calls this at startup before the server, camera and writer
+# threads exist. Without it the pool is started by the first scan.
+def start_pool():
+    _get_executor()
+
+
+# 🔹 The recognition workers, for batch work started from a request
+# (e.g. /bulk_import) that must not fork a pool of its own
+def shared_pool():
+    return _get_executor()
+
+
+# 🔹 Drop a pool whose worker died; the next submit starts a fresh one
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is not broken:
+            return
+        _executor = None
+    broken.shutdown(wait=False)
+    print("[⚠️] Recognition pool broken (a worker died), restarting it")
+
+
+# Returns (executor, future); a broken pool is replaced once
+def _submit(fn, *args):
+    executor = _get_executor()
+    try:
+        return executor, executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        executor = _get_executor()
+        return executor, executor.submit(fn, *args)
+
+
+# The worker's output, or the same work done in this process when the pool
+# broke under the job (so the frame is not lost)
+def _result(executor, future, image_bytes, tracks=None, timeout=None):
+    try:
+        return future.result(timeout)
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        return _recognize_in_worker(image_bytes, tracks)
+
+
+def _record_job(job, executor, future):
+    try:
+        out = _result(executor, future, job.image_bytes, job.tracks)
+        job.timings.update(out["timings"])
+        job.timings["queue_ms"] = max(0.0, (out["started"] - job.submitted) * 1000)
+
+        if "error" in out:
+            job.response = {"status": "failed", "message": f"Image processing error: {out['error']}"}
+            job.http_status = 400
+        else:
+            results = out["results"]
+            if job.tracker is not None:
+                job.tracker.update(results)
+                for r in results:
+                    r.pop("signature", None)
+            with _jobs_lock:
+                _stats["faces"] += len(results)
+                _stats["tracked_faces"] += sum(1 for r in results if r.get("tracked"))
+
+            t0 = time.perf_counter()
+            job.response = job.handler(results, job.image_bytes)
+            job.timings["record_ms"] = (time.perf_counter() - t0) * 1000
+    except Exception as e:
+        print(f"RECOGNITION JOB ERROR: {e}")
+        job.response = {"status": "failed", "message": f"Error: {str(e)}"}
+        job.http_status = 500
+
+    job.finished = time.time()
+    job.timings["total_ms"] = (job.finished - job.submitted) * 1000
+    job.image_bytes = None
+    job.tracks = None
+
+    with _jobs_lock:
+        _stats["completed"] += 1
+        if job.http_status != 200:
+            _stats["failed"] += 1
+        for stage, value in job.timings.items():
+            _stats["totals"][stage] += value
+            _stats["counts"][stage] += 1
+        _stats["last"] = dict(job.timings)
+    job._done.set()
+
+
+def _prune_jobs():
+    cutoff = time.time() - RECOGNITION_JOB_TTL
+    for job_id in [j.id for j in _jobs.values() if j.finished and j.finished < cutoff]:
+        del _jobs[job_id]
+
+
+# 🔹 Queue one frame for recognition
+# `handler(results, image_bytes)` runs once recognition finishes and
+# returns the JSON payload for the kiosk. Frames from the same `kiosk_id`
+# share a FaceTracker so faces that stay in view skip re-encoding.
+def submit_scan(image_bytes, handler, kiosk_id=None):
+    tracker = get_tracker(kiosk_id) if TRACKING_ENABLED and kiosk_id else None
+    tracks = tracker.snapshot() if tracker is not None else None
+
+    job = RecognitionJob(image_bytes, handler, tracker, tracks)
+    with _jobs_lock:
+        _prune_jobs()
+        _jobs[job.id] = job
+        _stats["submitted"] += 1
+
+    executor, future = _submit(_recognize_in_worker, image_bytes, tracks)
+    future.add_done_callback(lambda f: _recorder.submit(_record_job, job, executor, f))
+    return job
+
+
+# 🔹 Recognize several frames on the pool and wait for all of them
+# Returns one worker output per image ({"results": [...]} or {"error": ...});
+# nothing is recorded, the caller decides what to do with the matches.
+def recognize_images(images, timeout=None):
+    submitted = [_submit(_recognize_in_worker, image_bytes) for image_bytes in images]
+    return [_result(executor, f, image_bytes, timeout=timeout)
+            for image_bytes, (executor, f) in zip(images, submitted)]
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+# 🔹 Queue depth and average per-stage timings since start
+def pool_stats():
+    with _jobs_lock:
+        completed = _stats["completed"]
+        return {
+            "workers": _executor_workers,
+            "queue_depth": _stats["submitted"] - completed,
+            "submitted": _stats["submitted"],
+            "completed": completed,
+            "failed": _stats["failed"],
+            "faces": _stats["faces"],
+            "tracked_faces": _stats["tracked_faces"],
+            "avg_ms": {
+                s: round(_stats["totals"][s] / n, 2) for s, n in _stats["counts"].items() if n
+            },
+            "last_ms": {s: round(t, 2) for s, t in _stats["last"].items()}
+        }
@@ -0,0 +1,72 @@
+import os
+import queue
+import atexit
+import threading
+
+from config import UPLOAD_FOLDER, SCAN_ARCHIVE_ASYNC
+
+# 🔹 Folder where time-in / time-out scan pictures are archived
+SCANS_FOLDER = os.path.join(UPLOAD_FOLDER, "scans")
+
+# Pending writes; when full, archive_scan writes inline instead of blocking
+_pending = queue.Queue(maxsize=256)
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _writer_loop():
+    while True:
+        path, data = _pending.get()
+        try:
+            _write_file(path, data)
+        except Exception as e:
+            print(f"[❌] Failed to archive scan {path}: {e}")
+        finally:
+            _pending.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="scan-archive", daemon=True)
+            _writer.start()
+
+
+# 🔹 Where archive_scan(data, filename) puts its file
+def scan_path(filename):
+    return os.path.join(SCANS_FOLDER, filename)
+
+
+# 🔹 Archive the original upload bytes once, off the request thread
+# Returns the final path straight away; the file appears once the
+# background writer gets to it.
+def archive_scan(data, filename, background=SCAN_ARCHIVE_ASYNC):
+    path = scan_path(filename)
+    if background:
+        _ensure_writer()
+        try:
+            _pending.put_nowait((path, data))
+            return path
+        except queue.Full:
+            pass
+    _write_file(path, data)
+    return path
+
+
+# 🔹 Block until every queued scan is on disk
+def flush_scans():
+    _pending.join()
+
+
+atexit.register(flush_scans)
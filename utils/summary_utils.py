@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+# =====================================================
+# DAILY SUMMARY
+# =====================================================
+# daily_summary holds present / half-day / absent counts per date and
+# department. Triggers keep it current on every attendance insert, half-day
+# change and staff change, whichever code path does the write. The first
+# check-in of a day creates a row per department with everyone absent, so
+# later hires or departures do not rewrite past days.
+
+# Department key used for staff without one (and unknown emp_ids)
+_DEPT = "COALESCE((SELECT department FROM staff WHERE emp_id = {emp}), '')"
+_TODAY = "date('now', 'localtime')"
+
+SUMMARY_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_insert
+    AFTER INSERT ON attendance WHEN NEW.status = 'Present'
+    BEGIN
+        -- First check-in of a day creates a row for every department
+        INSERT OR IGNORE INTO daily_summary (summary_date, department, absent)
+        SELECT NEW.attendance_date, COALESCE(department, ''), COUNT(*)
+        FROM staff GROUP BY COALESCE(department, '');
+        INSERT OR IGNORE INTO daily_summary (summary_date, department)
+        VALUES (NEW.attendance_date, {_DEPT.format(emp="NEW.emp_id")});
+        UPDATE daily_summary
+        SET present = present + 1,
+            absent = MAX(absent - 1, 0),
+            half_day = half_day + (COALESCE(NEW.is_half_day, 0) != 0)
+        WHERE summary_date = NEW.attendance_date AND department = {_DEPT.format(emp="NEW.emp_id")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_summary_attendance_delete
+    AFTER DELETE ON attendance WHEN OLD.status = 'Present'
+    BEGIN
+        UPDATE daily_summary
+        SET present = MAX(present - 1, 0),
+            absent = absent + 1,
+            half_day = MAX(half_day - (COALESCE(OLD.is_half_day, 0) != 0), 0)
+        WHERE summary_date = OLD.attendance_date AND department = {_DEPT.format(emp="OLD.emp_id")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_summary_half_day
+    AFTER UPDATE OF is_half_day ON attendance
+    WHEN NEW.status = 'Present' AND (COALESCE(OLD.is_half_day, 0) != 0) != (COALESCE(NEW.is_half_day, 0) != 0)
+    BEGIN
+        UPDATE daily_summary
+        SET half_day = MAX(half_day + (CASE WHEN COALESCE(NEW.is_half_day, 0) != 0 THEN 1 ELSE -1 END), 0)
+        WHERE summary_date = NEW.attendance_date AND department = {_DEPT.format(emp="NEW.emp_id")};
+    END
+    """,
+    # New staff member: one more absentee today (if today's row exists yet)
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_summary_staff_insert
+    AFTER INSERT ON staff
+    BEGIN
+        UPDATE daily_summary SET absent = absent + 1
+        WHERE summary_date = {_TODAY} AND department = COALESCE(NEW.department, '');
+    END
+    """,
+    # Removed staff member who had not checked in today: one fewer absentee
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_summary_staff_delete
+    AFTER DELETE ON staff
+    WHEN NOT EXISTS (SELECT 1 FROM attendance WHERE emp_id = OLD.emp_id AND attendance_date = {_TODAY})
+    BEGIN
+        UPDATE daily_summary SET absent = MAX(absent - 1, 0)
+        WHERE summary_date = {_TODAY} AND department = COALESCE(OLD.department, '');
+    END
+    """,
+    # Department change: today's absentee moves with the person
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_summary_staff_department
+    AFTER UPDATE OF department ON staff
+    WHEN COALESCE(OLD.department, '') != COALESCE(NEW.department, '')
+     AND NOT EXISTS (SELECT 1 FROM attendance WHERE emp_id = NEW.emp_id AND attendance_date = {_TODAY})
+    BEGIN
+        UPDATE daily_summary SET absent = MAX(absent - 1, 0)
+        WHERE summary_date = {_TODAY} AND department = COALESCE(OLD.department, '');
+        UPDATE daily_summary SET absent = absent + 1
+        WHERE summary_date = {_TODAY} AND department = COALESCE(NEW.department, '');
+    END
+    """
+]
+
+
+# 🔹 Recompute daily_summary from attendance (backfill / repair)
+# Absent counts use today's staff list for every day. Takes a connection or
+# cursor and runs inside the caller's transaction.
+def rebuild_daily_summary(conn):
+    conn.execute("DELETE FROM daily_summary")
+    # Every department starts fully absent on every day with a check-in ...
+    conn.execute("""
+        INSERT INTO daily_summary (summary_date, department, absent)
+        SELECT days.attendance_date, d.department, d.staff_count
+        FROM (SELECT DISTINCT attendance_date FROM attendance WHERE status = 'Present') days
+        CROSS JOIN (
+            SELECT COALESCE(department, '') AS department, COUNT(*) AS staff_count
+            FROM staff GROUP BY COALESCE(department, '')
+        ) d
+    """)
+    # ... then the day's check-ins are folded in per department
+    conn.execute("""
+        INSERT INTO daily_summary (summary_date, department, present, half_day)
+        SELECT a.attendance_date, COALESCE(s.department, '') AS dept,
+               COUNT(*), SUM(COALESCE(a.is_half_day, 0) != 0)
+        FROM attendance a
+        LEFT JOIN staff s ON s.emp_id = a.emp_id
+        WHERE a.status = 'Present'
+        GROUP BY a.attendance_date, dept
+        ON CONFLICT(summary_date, department) DO UPDATE SET
+            present = excluded.present,
+            half_day = excluded.half_day,
+            absent = MAX(daily_summary.absent - excluded.present, 0)
+    """)
+    return conn.execute("SELECT COUNT(*) FROM daily_summary").fetchone()[0]
+
+
+# 🔹 Present / half-day / absent per day for the last `days` days
+# Days without any check-in show everyone absent.
+def daily_trend(conn, days=7, total_staff=None, today=None):
+    today = today or datetime.now().date()
+    start = (today - timedelta(days=days - 1)).isoformat()
+    if total_staff is None:
+        total_staff = conn.execute("SELECT COUNT(*) FROM staff").fetchone()[0]
+
+    rows = {
+        r[0]: (r[1], r[2], r[3])
+        for r in conn.execute("""
+            SELECT summary_date, SUM(present), SUM(half_day), SUM(absent)
+            FROM daily_summary WHERE summary_date >= ?
+            GROUP BY summary_date
+        """, (start,))
+    }
+
+    trend = []
+    for offset in range(days):
+        day = (today - timedelta(days=days - 1 - offset)).isoformat()
+        present, half_day, absent = rows.get(day, (0, 0, None))
+        if absent is None or day == today.isoformat():
+            # Today's absentees follow the live staff list
+            absent = max(total_staff - present, 0)
+        trend.append({"date": day, "present": present, "half_day": half_day, "absent": absent})
+    return trend
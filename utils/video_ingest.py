@@ -0,0 +1,173 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import cv2
+
+from utils.db_utils import connect_db
+
+
+# 🔹 Frame count and frame rate of a video file
+def probe_video(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    finally:
+        cap.release()
+    return frames, fps
+
+
+# 🔹 Split [0, frames) into time chunks aligned on the sampling step
+def plan_chunks(frames, step, chunk_frames):
+    chunk_frames = max(step, chunk_frames - chunk_frames % step)
+    return [(start, min(start + chunk_frames, frames)) for start in range(0, frames, chunk_frames)]
+
+
+# 🔹 Runs in a pool worker: scan one chunk of the video
+# Skipped frames are only grabbed (no decode); sampled frames go through
+# detection, a per-chunk face tracker and gallery matching. Returns
+# {"seen": {emp_id: [first_sec, last_sec]}, "sampled": n, "faces": n}.
+def _scan_chunk(video_path, start, end, step, fps):
+    from utils.face_utils import get_gallery, recognize_faces_from_frame
+    from utils.face_tracker import FaceTracker
+
+    gallery = get_gallery()
+    tracker = FaceTracker()
+    seen, sampled, faces = {}, 0, 0
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        for index in range(start, end):
+            if not cap.grab():
+                break
+            if (index - start) % step:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                continue
+            sampled += 1
+
+            second = index / fps
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            results = recognize_faces_from_frame(rgb, gallery, tracks=tracker.snapshot(second))
+            tracker.update(results, second)
+            faces += len(results)
+
+            for r in results:
+                span = seen.setdefault(r["emp_id"], [second, second])
+                span[1] = second
+    finally:
+        cap.release()
+
+    return {"seen": seen, "sampled": sampled, "faces": faces}
+
+
+# 🔹 First-seen / last-seen per employee and day from merged chunk spans
+# A last sighting closer than `min_gap` seconds to the first is treated as
+# the same pass through the gate and produces no time-out event.
+def build_events(spans, video_start, min_gap):
+    days = {}
+    for emp_id, (first, last) in spans.items():
+        first_at = video_start + timedelta(seconds=first)
+        last_at = video_start + timedelta(seconds=last)
+        # Footage spanning midnight yields one entry per day
+        day = first_at.date()
+        while day <= last_at.date():
+            day_first = max(first_at, datetime.combine(day, datetime.min.time()))
+            day_last = min(last_at, datetime.combine(day, datetime.max.time()))
+            days[(emp_id, day.isoformat())] = (day_first, day_last)
+            day += timedelta(days=1)
+
+    events = []
+    for (emp_id, day), (first_at, last_at) in sorted(days.items(), key=lambda kv: kv[1][0]):
+        events.append({
+            "emp_id": emp_id,
+            "date": day,
+            "time_in": first_at.strftime("%H:%M:%S"),
+            "time_out": last_at.strftime("%H:%M:%S") if (last_at - first_at).total_seconds() >= min_gap else None
+        })
+    return events
+
+
+# 🔹 Merge events into attendance in one transaction
+# New (emp_id, date) pairs are inserted; existing rows only widen their
+# time_in / time_out window, so re-running on the same footage is harmless.
+def save_events(events, conn=None):
+    own = conn is None
+    conn = conn or connect_db()
+    try:
+        with conn:
+            # AUTOINCREMENT ids only grow, so a returned id above this one is a
+            # new row; an unchanged row returns nothing. (total_changes would
+            # also count the rows touched by the summary / cache triggers.)
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM attendance").fetchone()[0]
+            inserted = updated = 0
+            for event in events:
+                row = conn.execute("""
+                    INSERT INTO attendance (emp_id, attendance_date, time_in, time_out, status)
+                    VALUES (:emp_id, :date, :time_in, :time_out, 'Present')
+                    ON CONFLICT(emp_id, attendance_date) DO UPDATE SET
+                        time_in = MIN(COALESCE(attendance.time_in, excluded.time_in), excluded.time_in),
+                        time_out = MAX(COALESCE(attendance.time_out, excluded.time_out), COALESCE(excluded.time_out, attendance.time_out))
+                    WHERE attendance.time_in IS NOT MIN(COALESCE(attendance.time_in, excluded.time_in), excluded.time_in)
+                       OR attendance.time_out IS NOT MAX(COALESCE(attendance.time_out, excluded.time_out), COALESCE(excluded.time_out, attendance.time_out))
+                    RETURNING id
+                """, event).fetchone()
+                if row is None:
+                    continue
+                if row[0] > last_id:
+                    inserted += 1
+                else:
+                    updated += 1
+    finally:
+        if own:
+            conn.close()
+    return inserted, updated
+
+
+# 🔹 Reconstruct attendance from a CCTV recording
+# `video_start` is the wall-clock time of the first frame. Frames are sampled
+# `sample_fps` times per second and chunks of `chunk_seconds` are spread over
+# a process pool.
+def ingest_video(video_path, video_start, sample_fps=2.0, chunk_seconds=60, workers=None,
+                 min_gap=60, save=True):
+    started = time.perf_counter()
+    frames, fps = probe_video(video_path)
+    step = max(1, int(round(fps / sample_fps)))
+    chunks = plan_chunks(frames, step, int(chunk_seconds * fps))
+    workers = min(workers or os.cpu_count() or 1, max(1, len(chunks)))
+
+    spans, sampled, faces = {}, 0, 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_scan_chunk, video_path, s, e, step, fps) for s, e in chunks]
+        for future in futures:
+            out = future.result()
+            sampled += out["sampled"]
+            faces += out["faces"]
+            for emp_id, (first, last) in out["seen"].items():
+                span = spans.setdefault(emp_id, [first, last])
+                span[0], span[1] = min(span[0], first), max(span[1], last)
+
+    events = build_events(spans, video_start, min_gap)
+    inserted, updated = save_events(events) if save and events else (0, 0)
+
+    seconds = time.perf_counter() - started
+    return {
+        "events": events,
+        "inserted": inserted,
+        "updated": updated,
+        "video_seconds": round(frames / fps, 1),
+        "frames": frames,
+        "sampled": sampled,
+        "faces": faces,
+        "chunks": len(chunks),
+        "workers": workers,
+        "seconds": round(seconds, 2),
+        "frames_per_sec": round(frames / seconds, 1) if seconds else 0.0,
+        "sampled_per_sec": round(sampled / seconds, 1) if seconds else 0.0
+    }